@@ -0,0 +1,111 @@
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_BASE_URL = os.getenv("API_BASE_URL", "https://lab7-97641147142.me-central1.run.app")
+CONNECT_TIMEOUT = float(os.getenv("API_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("API_READ_TIMEOUT", "180"))
+RETRIES = int(os.getenv("API_RETRIES", "2"))
+BACKOFF_FACTOR = float(os.getenv("API_BACKOFF_FACTOR", "0.5"))
+POOL_SIZE = int(os.getenv("API_POOL_SIZE", "20"))
+HEALTH_TTL = float(os.getenv("API_HEALTH_TTL", "30"))
+
+
+class ApiClient:
+    """Keep-alive HTTP client for the Flask API shared by the Streamlit app and scripts."""
+
+    def __init__(self, base_url=DEFAULT_BASE_URL, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+                 retries=RETRIES, backoff_factor=BACKOFF_FACTOR, pool_size=POOL_SIZE,
+                 health_ttl=HEALTH_TTL):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.health_ttl = health_ttl
+        self._health = None
+        self._health_checked_at = 0.0
+        self._health_refreshing = False
+        self._health_lock = threading.Lock()
+        # Body of the last successful /health response, e.g. {"model_circuit": "open"}
+        self.health_detail = {}
+
+        # One pooled session means one TCP+TLS handshake per connection, not per call.
+        # Status and read-timeout retries are for GET only: a POST may already have
+        # started a job or a chat turn. urllib3 still retries any method when the
+        # connection itself fails, since nothing was sent. Retry-After is not
+        # honoured, so a fail-fast 503 from the API stays fast here too
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(429, 502, 503, 504),
+            allowed_methods=frozenset(["GET"]),
+            respect_retry_after_header=False,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def url(self, endpoint):
+        return f"{self.base_url}/{endpoint.lstrip('/')}"
+
+    def post(self, endpoint, payload, stream=False, timeout=None):
+        return self.session.post(self.url(endpoint), json=payload, stream=stream,
+                                 timeout=timeout or self.timeout)
+
+    def get(self, endpoint, timeout=None, **kwargs):
+        return self.session.get(self.url(endpoint), timeout=timeout or self.timeout, **kwargs)
+
+    def health(self, force=False, block=True):
+        # Cached for health_ttl seconds so frequent reruns don't each hit /health.
+        # With block=False an expired value is returned at once and refreshed in the background
+        with self._health_lock:
+            if not force and time.monotonic() - self._health_checked_at < self.health_ttl:
+                return self._health
+            if not block:
+                if not self._health_refreshing:
+                    self._health_refreshing = True
+                    threading.Thread(target=self._refresh_health, daemon=True).start()
+                return self._health
+        return self._refresh_health()
+
+    @property
+    def health_checked(self):
+        return self._health_checked_at > 0
+
+    def _refresh_health(self):
+        detail = {}
+        try:
+            response = self.get("health", timeout=(CONNECT_TIMEOUT, CONNECT_TIMEOUT))
+            healthy = response.status_code == 200
+            if healthy:
+                detail = response.json()
+        except requests.exceptions.RequestException:
+            healthy = None
+        except ValueError:
+            pass
+        with self._health_lock:
+            self._health = healthy
+            self.health_detail = detail
+            self._health_checked_at = time.monotonic()
+            self._health_refreshing = False
+        return healthy
+
+    def close(self):
+        self.session.close()
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(base_url=DEFAULT_BASE_URL):
+    # Module-level registry: Streamlit re-executes app.py but not imported modules
+    with _clients_lock:
+        client = _clients.get(base_url)
+        if client is None:
+            client = _clients[base_url] = ApiClient(base_url)
+        return client
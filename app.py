@@ -1,12 +1,21 @@
 import streamlit as st
-import requests
 import json
 import os
+import time
+
+from api_client import get_client
+from categories import CATEGORIES
+import rates
 
 # Set the base URL for the API
 # BASE_URL = "http://127.0.0.1:5000"  # Local development
 BASE_URL = "https://lab7-97641147142.me-central1.run.app"  # Cloud deployment
 
+# Results kept per session so page switches and repeated inputs skip the API
+RESULT_CACHE_SIZE = 50
+# Stop polling a background job after this long (the service fails it after JOB_MAX_RUNTIME)
+JOB_TIMEOUT = 900
+
 st.set_page_config(
     page_title="Customer Support AI Assistant",
     page_icon="🤖",
@@ -14,6 +23,13 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Pooled keep-alive client, created once per server process rather than per rerun
+@st.cache_resource
+def get_api(base_url):
+    return get_client(base_url)
+
+api = get_api(BASE_URL)
+
 # Sidebar for navigation
 st.sidebar.title("Navigation")
 page = st.sidebar.radio(
@@ -22,11 +38,108 @@ page = st.sidebar.radio(
      "Mortgage Response", "Newsletter Analysis"]
 )
 
+# Static reference data, built once and shared by every session
+@st.cache_data
+def rate_table():
+    return rates.as_table()
+
+@st.cache_data
+def category_list():
+    return "**Available Categories:**\n" + "\n".join(f"- {category}" for category in CATEGORIES)
+
+@st.cache_data
+def load_examples():
+    return {
+        "queries": [
+            "How do I open a new checking account?",
+            "I noticed an unauthorized transaction on my account.",
+            "What are the current interest rates for home loans?",
+            "I want to apply for a credit card with rewards.",
+            "I can't log into my online banking account.",
+            "I think someone has stolen my debit card.",
+            "What are your branch hours on weekends?"
+        ],
+        "medical_notes": """
+        A 60-year-old male patient, Mr. Johnson, presented with symptoms
+        of increased thirst, frequent urination, fatigue, and unexplained
+        weight loss. Upon evaluation, he was diagnosed with diabetes,
+        confirmed by elevated blood sugar levels. Mr. Johnson's weight
+        is 210 lbs. He has been prescribed Metformin to be taken twice daily
+        with meals. It was noted during the consultation that the patient is
+        a current smoker.
+        """,
+        "emails": [
+            """
+            Dear mortgage lender,
+            
+            What's your 30-year fixed-rate APR, and how does it compare to the 15-year
+            fixed rate? I'm trying to decide which term would be better for me.
+            
+            Best regards,
+            John
+            """,
+            """
+            Hello,
+            
+            I'm interested in an FHA loan. Could you tell me what the current rates are
+            and what the requirements are for qualification?
+            
+            Thanks,
+            Sarah
+            """,
+            """
+            To whom it may concern,
+            
+            I'm comparing different ARM options. Can you explain the differences between
+            your 3-year, 5-year, and 7-year ARMs?
+            
+            Regards,
+            Michael
+            """
+        ],
+        "newsletter": """
+        Q3 2023 Market Update
+
+        The third quarter saw significant developments in the tech sector, with AI 
+        continuing to dominate headlines. Major companies announced new AI products,
+        while concerns about AI safety led to increased calls for regulation.
+
+        In financial markets, inflation showed signs of cooling, though central banks
+        maintained their hawkish stance. The S&P 500 experienced volatility but
+        ended the quarter with modest gains.
+
+        The real estate market remained challenging due to high interest rates,
+        with home sales declining in most regions. However, rental markets showed
+        strength in urban areas.
+        """
+    }
+
+examples = load_examples()
+
+# Session result cache keyed by endpoint and input
+def result_key(endpoint, payload):
+    return f"{endpoint}:{json.dumps(payload, sort_keys=True)}"
+
+def last_result(endpoint, payload):
+    return st.session_state.get("results", {}).get(result_key(endpoint, payload))
+
+def remember_result(endpoint, payload, result):
+    # Stale answers are shown once but not reused, so the next click asks again
+    if result.get("stale"):
+        return
+    results = st.session_state.setdefault("results", {})
+    results[result_key(endpoint, payload)] = result
+    while len(results) > RESULT_CACHE_SIZE:
+        results.pop(next(iter(results)))
+
+def show_stale(result):
+    if result.get("stale"):
+        st.caption("⚠️ Saved answer: the model service is unavailable right now")
+
 # Function to call API endpoints
 def call_api(endpoint, payload):
-    url = f"{BASE_URL}/{endpoint}"
     try:
-        response = requests.post(url, json=payload)
+        response = api.post(endpoint, payload)
         if response.status_code == 200:
             return response.json(), None
         else:
@@ -34,40 +147,109 @@ def call_api(endpoint, payload):
     except Exception as e:
         return None, f"Error: {str(e)}"
 
-# Check if API is healthy
-def check_health():
+# Stream an endpoint's Server-Sent Events, rendering tokens as they arrive
+def stream_api(endpoint, payload):
+    placeholder = st.empty()
+    text = ""
     try:
-        response = requests.get(f"{BASE_URL}/health")
-        if response.status_code == 200:
-            st.sidebar.success("✅ API is online")
-        else:
-            st.sidebar.error("❌ API is offline")
-    except:
+        with api.post(endpoint, {**payload, "stream": True}, stream=True) as response:
+            if response.status_code != 200:
+                return None, f"Error: {response.text}"
+            for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+                if not line or not line.startswith("data: "):
+                    continue
+                event = json.loads(line[len("data: "):])
+                if "token" in event:
+                    text += event["token"]
+                    placeholder.markdown(text + "▌")
+                elif event.get("status") == "error":
+                    placeholder.empty()
+                    return None, f"Error: {event['error']}"
+                else:
+                    placeholder.markdown(event["response"])
+                    return event, None
+        return None, "Error: response stream ended unexpectedly"
+    except Exception as e:
+        return None, f"Error: {str(e)}"
+
+# Submit a background job and long-poll /jobs/<id> until it finishes
+def run_job(endpoint, payload):
+    status = st.empty()
+    try:
+        response = api.post(endpoint, {**payload, "job": True})
+        if response.status_code != 202:
+            return None, f"Error: {response.text}"
+        job = response.json()
+        deadline = time.monotonic() + JOB_TIMEOUT
+        while job.get("state") not in ("done", "failed"):
+            if time.monotonic() > deadline:
+                status.empty()
+                return None, f"Error: job {job['job_id']} did not finish within {JOB_TIMEOUT} seconds"
+            status.info(f"Job {job['job_id'][:8]} is {job['state']}...")
+            response = api.get(f"jobs/{job['job_id']}", params={"wait": 20})
+            if response.status_code != 200:
+                return None, f"Error: {response.text}"
+            job = response.json()
+        status.empty()
+        if job["state"] == "failed":
+            return None, f"Error: {job.get('error')}"
+        return job, None
+    except Exception as e:
+        status.empty()
+        return None, f"Error: {str(e)}"
+
+# Check if API is healthy; never blocks the rerun, the check runs in the background
+def check_health():
+    healthy = api.health(block=False)
+    if not api.health_checked:
+        st.sidebar.info("⏳ Checking API status...")
+    elif healthy:
+        st.sidebar.success("✅ API is online")
+        if api.health_detail.get("model_circuit") == "open":
+            st.sidebar.warning("⚠️ Model service is degraded; answers may be saved ones")
+    elif healthy is False:
+        st.sidebar.error("❌ API is offline")
+    else:
         st.sidebar.error("❌ Cannot connect to API")
 
 # Call health check
 check_health()
 
+# Saved results otherwise stay until the browser session ends
+if st.session_state.get("results") and st.sidebar.button("Clear saved results"):
+    st.session_state["results"] = {}
+
 # Chat page
 if page == "Chat":
     st.title("💬 Customer Support Chat")
     st.write("Ask any customer support related question and get an AI-powered response.")
     
+    # The API keeps the conversation history; the app only remembers the session id
+    if st.button("New conversation", key="chat_reset"):
+        st.session_state.pop("chat_session_id", None)
+        st.session_state["chat_turns"] = []
+    for role, content in st.session_state.get("chat_turns", []):
+        with st.chat_message(role):
+            st.markdown(content)
+    
     # Input for user message
     user_message = st.text_area("Your question:", height=100)
     
     if st.button("Send", key="chat_send"):
         if user_message:
             with st.spinner("Getting response..."):
+                session_id = st.session_state.get("chat_session_id")
                 payload = {"message": user_message}
-                result, error = call_api("chat", payload)
+                payload.update({"session_id": session_id} if session_id else {"session": True})
+                st.subheader("Response:")
+                result, error = stream_api("chat", payload)
                 
                 if error:
                     st.error(error)
                 else:
-                    st.subheader("Response:")
-                    st.write(result["response"])
-                    
+                    st.session_state["chat_session_id"] = result.get("session_id")
+                    st.session_state.setdefault("chat_turns", []).extend(
+                        [("user", user_message), ("assistant", result["response"])])
                     # Display the raw JSON
                     with st.expander("View raw JSON"):
                         st.json(result)
@@ -80,17 +262,7 @@ elif page == "Query Categorization":
     st.write("Categorize customer inquiries for a bank's customer service team.")
     
     # Predefined categories for reference
-    st.info("""
-    **Available Categories:**
-    - Account Management
-    - Transaction Issues
-    - Loan Services
-    - Credit Cards
-    - Online Banking
-    - Fraud and Security
-    - General Information
-    - Other
-    """)
+    st.info(category_list())
     
     # Input options
     query_input_type = st.radio(
@@ -99,36 +271,33 @@ elif page == "Query Categorization":
     )
     
     if query_input_type == "Select from examples":
-        example_queries = [
-            "How do I open a new checking account?",
-            "I noticed an unauthorized transaction on my account.",
-            "What are the current interest rates for home loans?",
-            "I want to apply for a credit card with rewards.",
-            "I can't log into my online banking account.",
-            "I think someone has stolen my debit card.",
-            "What are your branch hours on weekends?"
-        ]
-        query = st.selectbox("Select an example query:", example_queries)
+        query = st.selectbox("Select an example query:", examples["queries"])
     else:
         query = st.text_area("Enter your query:", height=100)
     
+    payload = {"query": query}
+    result = last_result("categorize", payload)
     if st.button("Categorize", key="categorize_btn"):
-        if query:
+        if not query:
+            st.warning("Please enter or select a query.")
+        elif result is None:
             with st.spinner("Categorizing..."):
-                payload = {"query": query}
                 result, error = call_api("categorize", payload)
-                
                 if error:
                     st.error(error)
                 else:
-                    st.subheader("Category:")
-                    st.success(result["response"])
-                    
-                    # Display the raw JSON
-                    with st.expander("View raw JSON"):
-                        st.json(result)
-        else:
-            st.warning("Please enter or select a query.")
+                    remember_result("categorize", payload, result)
+    
+    if query and result:
+        st.subheader("Category:")
+        st.success(result.get("category", result["response"]))
+        if result.get("source"):
+            st.caption(f"Answered by the {result['source']}")
+        show_stale(result)
+        
+        # Display the raw JSON
+        with st.expander("View raw JSON"):
+            st.json(result)
 
 # Medical Info Extraction page
 elif page == "Medical Info Extraction":
@@ -142,15 +311,7 @@ elif page == "Medical Info Extraction":
     )
     
     if medical_input_type == "Use example":
-        medical_notes = """
-        A 60-year-old male patient, Mr. Johnson, presented with symptoms
-        of increased thirst, frequent urination, fatigue, and unexplained
-        weight loss. Upon evaluation, he was diagnosed with diabetes,
-        confirmed by elevated blood sugar levels. Mr. Johnson's weight
-        is 210 lbs. He has been prescribed Metformin to be taken twice daily
-        with meals. It was noted during the consultation that the patient is
-        a current smoker.
-        """
+        medical_notes = examples["medical_notes"]
     else:
         medical_notes = st.text_area("Enter medical notes:", height=200)
     
@@ -158,41 +319,45 @@ elif page == "Medical Info Extraction":
     st.subheader("Medical Notes:")
     st.write(medical_notes)
     
+    payload = {"medical_notes": medical_notes}
+    result = last_result("extract-medical", payload)
     if st.button("Extract Information", key="extract_btn"):
-        if medical_notes:
+        if not medical_notes:
+            st.warning("Please enter medical notes.")
+        elif result is None:
             with st.spinner("Extracting information..."):
-                payload = {"medical_notes": medical_notes}
                 result, error = call_api("extract-medical", payload)
-                
                 if error:
                     st.error(error)
                 else:
-                    st.subheader("Extracted Information:")
-                    
-                    # Try to parse the JSON from the response
-                    try:
-                        extracted_data = json.loads(result["response"])
-                        
-                        # Create columns for displaying the data
-                        col1, col2 = st.columns(2)
-                        
-                        with col1:
-                            st.metric("Age", extracted_data.get("age", "N/A"))
-                            st.metric("Gender", extracted_data.get("gender", "N/A"))
-                            st.metric("Diagnosis", extracted_data.get("diagnosis", "N/A"))
-                        
-                        with col2:
-                            st.metric("Weight", f"{extracted_data.get('weight', 'N/A')} lbs" if extracted_data.get('weight') else "N/A")
-                            st.metric("Smoking", extracted_data.get("smoking", "N/A"))
-                    
-                    except:
-                        st.write(result["response"])
-                    
-                    # Display the raw JSON
-                    with st.expander("View raw JSON"):
-                        st.json(result)
-        else:
-            st.warning("Please enter medical notes.")
+                    remember_result("extract-medical", payload, result)
+    
+    if medical_notes and result:
+        st.subheader("Extracted Information:")
+        show_stale(result)
+        
+        # The API returns typed, schema-validated fields
+        extracted_data = result.get("fields", {})
+        validation = result.get("validation", {})
+        if validation.get("status") == "invalid":
+            st.warning("Some fields could not be validated: " +
+                       ", ".join(f"{name} ({reason})" for name, reason in validation["errors"].items()))
+        
+        # Create columns for displaying the data
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            st.metric("Age", extracted_data.get("age") or "N/A")
+            st.metric("Gender", extracted_data.get("gender") or "N/A")
+            st.metric("Diagnosis", extracted_data.get("diagnosis") or "N/A")
+        
+        with col2:
+            st.metric("Weight", f"{extracted_data['weight']} lbs" if extracted_data.get("weight") else "N/A")
+            st.metric("Smoking", extracted_data.get("smoking") or "N/A")
+        
+        # Display the raw JSON
+        with st.expander("View raw JSON"):
+            st.json(result)
 
 # Mortgage Response page
 elif page == "Mortgage Response":
@@ -201,15 +366,7 @@ elif page == "Mortgage Response":
     
     # Display mortgage rates for reference
     with st.expander("View Current Mortgage Rates"):
-        st.table({
-            "Product": ["30-year fixed-rate", "20-year fixed-rate", "15-year fixed-rate", 
-                       "10-year fixed-rate", "7-year ARM", "5-year ARM", "3-year ARM",
-                       "30-year fixed-rate FHA", "30-year fixed-rate VA"],
-            "Interest Rate": ["6.403%", "6.329%", "5.705%", "5.500%", "7.011%", 
-                             "6.880%", "6.125%", "5.527%", "5.684%"],
-            "APR": ["6.484%", "6.429%", "5.848%", "5.720%", "7.660%", 
-                   "7.754%", "7.204%", "6.316%", "6.062%"]
-        })
+        st.table(rate_table())
     
     # Input options
     email_input_type = st.radio(
@@ -218,35 +375,7 @@ elif page == "Mortgage Response":
     )
     
     if email_input_type == "Select from examples":
-        example_emails = [
-            """
-            Dear mortgage lender,
-            
-            What's your 30-year fixed-rate APR, and how does it compare to the 15-year
-            fixed rate? I'm trying to decide which term would be better for me.
-            
-            Best regards,
-            John
-            """,
-            """
-            Hello,
-            
-            I'm interested in an FHA loan. Could you tell me what the current rates are
-            and what the requirements are for qualification?
-            
-            Thanks,
-            Sarah
-            """,
-            """
-            To whom it may concern,
-            
-            I'm comparing different ARM options. Can you explain the differences between
-            your 3-year, 5-year, and 7-year ARMs?
-            
-            Regards,
-            Michael
-            """
-        ]
+        example_emails = examples["emails"]
         email_index = st.selectbox("Select an example email:", range(len(example_emails)), 
                                  format_func=lambda i: f"Example {i+1}")
         email = example_emails[email_index]
@@ -257,23 +386,31 @@ elif page == "Mortgage Response":
     st.subheader("Customer Email:")
     st.text(email)
     
+    payload = {"email": email}
+    result = last_result("mortgage-response", payload)
+    streamed = False
     if st.button("Generate Response", key="mortgage_btn"):
-        if email:
+        if not email:
+            st.warning("Please enter an email.")
+        elif result is None:
             with st.spinner("Generating response..."):
-                payload = {"email": email}
-                result, error = call_api("mortgage-response", payload)
-                
+                st.subheader("Generated Response:")
+                result, error = stream_api("mortgage-response", payload)
+                streamed = True
                 if error:
                     st.error(error)
                 else:
-                    st.subheader("Generated Response:")
-                    st.write(result["response"])
-                    
-                    # Display the raw JSON
-                    with st.expander("View raw JSON"):
-                        st.json(result)
-        else:
-            st.warning("Please enter an email.")
+                    remember_result("mortgage-response", payload, result)
+    
+    if email and result:
+        if not streamed:
+            st.subheader("Generated Response:")
+            st.markdown(result["response"])
+        show_stale(result)
+        
+        # Display the raw JSON
+        with st.expander("View raw JSON"):
+            st.json(result)
 
 # Newsletter Analysis page
 elif page == "Newsletter Analysis":
@@ -287,21 +424,7 @@ elif page == "Newsletter Analysis":
     )
     
     if newsletter_input_type == "Use example":
-        newsletter = """
-        Q3 2023 Market Update
-
-        The third quarter saw significant developments in the tech sector, with AI 
-        continuing to dominate headlines. Major companies announced new AI products,
-        while concerns about AI safety led to increased calls for regulation.
-
-        In financial markets, inflation showed signs of cooling, though central banks
-        maintained their hawkish stance. The S&P 500 experienced volatility but
-        ended the quarter with modest gains.
-
-        The real estate market remained challenging due to high interest rates,
-        with home sales declining in most regions. However, rental markets showed
-        strength in urban areas.
-        """
+        newsletter = examples["newsletter"]
     else:
         newsletter = st.text_area("Enter newsletter content:", height=300)
     
@@ -309,23 +432,27 @@ elif page == "Newsletter Analysis":
     st.subheader("Newsletter Content:")
     st.write(newsletter)
     
+    payload = {"newsletter": newsletter}
+    result = last_result("analyze-newsletter", payload)
     if st.button("Analyze", key="newsletter_btn"):
-        if newsletter:
-            with st.spinner("Analyzing newsletter... This may take a minute."):
-                payload = {"newsletter": newsletter}
-                result, error = call_api("analyze-newsletter", payload)
-                
+        if not newsletter:
+            st.warning("Please enter newsletter content.")
+        elif result is None:
+            with st.spinner("Analyzing newsletter..."):
+                result, error = run_job("analyze-newsletter", payload)
                 if error:
                     st.error(error)
                 else:
-                    st.subheader("Analysis Report:")
-                    st.markdown(result["response"])
-                    
-                    # Display the raw JSON
-                    with st.expander("View raw JSON"):
-                        st.json(result)
-        else:
-            st.warning("Please enter newsletter content.")
+                    remember_result("analyze-newsletter", payload, result)
+    
+    if newsletter and result:
+        st.subheader("Analysis Report:")
+        st.markdown(result["response"])
+        show_stale(result)
+        
+        # Display the raw JSON
+        with st.expander("View raw JSON"):
+            st.json(result)
 
 # Footer
 st.sidebar.markdown("---")
@@ -0,0 +1,37 @@
+# Cooperative serving mode for the same Flask routes. gevent patches the socket,
+# ssl and threading modules before anything else is imported, so the blocking
+# requests calls inside MistralClient yield to other greenlets while they wait
+# on the network. One process can then hold hundreds of in-flight model calls
+# instead of one per worker thread.
+from gevent import monkey
+monkey.patch_all()
+
+import signal
+
+import gevent
+from gevent.pool import Pool
+from gevent.pywsgi import WSGIServer
+
+from config import Config
+from main import app
+
+
+def create_server(host=None, port=None, max_connections=None):
+    host = host or Config.ASYNC_HOST
+    port = port or Config.PORT
+    max_connections = max_connections or Config.ASYNC_MAX_CONNECTIONS
+    return WSGIServer((host, port), app, spawn=Pool(max_connections), log=None)
+
+
+def serve():
+    server = create_server()
+    # Stop accepting new connections and let in-flight requests finish
+    gevent.signal_handler(signal.SIGTERM, server.stop, Config.ASYNC_SHUTDOWN_TIMEOUT)
+    gevent.signal_handler(signal.SIGINT, server.stop, Config.ASYNC_SHUTDOWN_TIMEOUT)
+    print(f'Serving on {server.server_host}:{server.server_port} '
+          f'(up to {Config.ASYNC_MAX_CONNECTIONS} concurrent requests)')
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    serve()
@@ -0,0 +1,38 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from cache import normalize_text
+
+
+class BatchRunner:
+    """Fans batch items out to a shared, bounded thread pool and keeps input order."""
+
+    def __init__(self, max_workers=8, max_items=1000):
+        self.max_items = max_items
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='batch')
+
+    def validate(self, items, field):
+        if not isinstance(items, list) or not items:
+            return f'No {field} provided'
+        if len(items) > self.max_items:
+            return f'At most {self.max_items} {field} are allowed per batch'
+        return None
+
+    def run(self, items, handler):
+        # Identical inputs (ignoring whitespace) are sent upstream only once
+        futures = {}
+        for item in items:
+            if isinstance(item, str) and item.strip():
+                key = normalize_text(item)
+                if key not in futures:
+                    futures[key] = self._pool.submit(handler, item)
+
+        results = []
+        for item in items:
+            if not isinstance(item, str) or not item.strip():
+                results.append({'error': 'Empty or non-text input', 'status': 'error'})
+                continue
+            try:
+                results.append(futures[normalize_text(item)].result())
+            except Exception as e:
+                results.append({'error': str(e), 'status': 'error'})
+        return results
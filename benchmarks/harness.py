@@ -0,0 +1,272 @@
+"""Offline load test for the Flask service.
+
+Starts a mock Mistral API in-process, launches the service against it in a
+subprocess, drives the selected endpoints at a given concurrency (and
+optionally a fixed request rate), and prints a JSON report with throughput,
+latency percentiles, errors and memory use:
+
+    python -m benchmarks.harness --endpoints chat categorize --concurrency 32 --requests 500
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks.mock_mistral import MockSettings, start_mock_server
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MEDICAL_NOTES = (
+    "A 60-year-old male patient, Mr. Johnson, presented with symptoms of increased thirst, "
+    "frequent urination, fatigue, and unexplained weight loss. Upon evaluation, he was "
+    "diagnosed with diabetes. Mr. Johnson's weight is 210 lbs. The patient is a current smoker."
+)
+NEWSLETTER = (
+    "Q3 2023 Market Update\n\nThe third quarter saw significant developments in the tech sector, "
+    "with AI continuing to dominate headlines.\n\nIn financial markets, inflation showed signs of "
+    "cooling, though central banks maintained their hawkish stance.\n\nThe real estate market "
+    "remained challenging due to high interest rates."
+)
+
+# endpoint -> (path, payload builder); the counter keeps inputs unique so every
+# request exercises the full serving path unless --repeat-inputs is given
+ENDPOINTS = {
+    'chat': ('/chat', lambda i: {'message': f'How do I reset my password? (ticket {i})'}),
+    'categorize': ('/categorize', lambda i: {'query': f'I want to open a new account number {i}'}),
+    'extract-medical': ('/extract-medical', lambda i: {'medical_notes': f'{MEDICAL_NOTES} Visit {i}.'}),
+    'mortgage-response': ('/mortgage-response', lambda i: {
+        'email': f"Dear lender,\n\nWhat's your 30-year fixed-rate APR? Can you explain the options? Ref {i}\n\nJohn"}),
+    'analyze-newsletter': ('/analyze-newsletter', lambda i: {'newsletter': f'{NEWSLETTER}\n\nIssue {i}.'}),
+    'health': ('/health', None),
+}
+
+SERVERS = {
+    'dev': [sys.executable, '-c',
+            'import os; from main import app; '
+            'app.run(host="127.0.0.1", port=int(os.environ["PORT"]), threaded=True)'],
+    'async': [sys.executable, 'async_server.py'],
+    'gunicorn': [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+def rss_kb(pid, field='VmRSS'):
+    # Linux only; returns None elsewhere
+    try:
+        with open(f'/proc/{pid}/status') as status:
+            for line in status:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+def wait_until_ready(base_url, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'service exited with status {process.returncode}')
+        try:
+            if requests.get(f'{base_url}/health', timeout=1).status_code == 200:
+                return
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError('service did not become healthy in time')
+
+
+def state_env(state_dir):
+    # Everything the service writes to disk goes to a throwaway directory, so mock
+    # traffic never reaches the classifier's training log or the stores in ROOT
+    return {
+        'CLASSIFIER_LOG_PATH': os.path.join(state_dir, 'category_labels.jsonl'),
+        'CLASSIFIER_MODEL_PATH': os.path.join(state_dir, 'category_model.npz'),
+        'CACHE_PATH': os.path.join(state_dir, 'response_cache.sqlite3'),
+        'JOB_STORE_PATH': os.path.join(state_dir, 'jobs.sqlite3'),
+        'CHAT_SESSION_PATH': os.path.join(state_dir, 'chat_sessions.sqlite3'),
+        'TRAFFIC_LOG_DIR': os.path.join(state_dir, 'traffic_log'),
+    }
+
+
+def start_service(server, port, env_overrides):
+    command = SERVERS.get(server) or server.split()
+    state_dir = tempfile.mkdtemp(prefix='benchmark-state-')
+    env = dict(os.environ, PORT=str(port), ASYNC_HOST='127.0.0.1', **state_env(state_dir))
+    # Explicit --env settings (e.g. a TRAFFIC_LOG_DIR to keep) still win
+    env.update(env_overrides)
+    process = subprocess.Popen(command, cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    process.state_dir = state_dir
+    return process
+
+
+def stop_service(process):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+    shutil.rmtree(process.state_dir, ignore_errors=True)
+
+
+def run_load(base_url, endpoint, requests_total, concurrency, rate=None, repeat_inputs=False):
+    path, payload_for = ENDPOINTS[endpoint]
+    local = threading.local()
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    start = time.perf_counter()
+
+    def session():
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_maxsize=1)
+            local.session.mount('http://', adapter)
+        return local.session
+
+    def one(i):
+        if rate:
+            # Open-loop pacing: request i is due at i / rate seconds
+            delay = start + i / rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        sent = time.perf_counter()
+        try:
+            if payload_for is None:
+                status = session().get(base_url + path, timeout=300).status_code
+            else:
+                payload = payload_for(0 if repeat_inputs else i)
+                status = session().post(base_url + path, json=payload, timeout=300).status_code
+        except requests.exceptions.RequestException as e:
+            status = type(e).__name__
+        elapsed = time.perf_counter() - sent
+        with lock:
+            latencies.append(elapsed)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests_total)))
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+    ok = statuses.get('200', 0)
+    return {
+        'endpoint': endpoint,
+        'requests': requests_total,
+        'concurrency': concurrency,
+        'target_rate': rate,
+        'wall_seconds': round(wall, 4),
+        'throughput_rps': round(requests_total / wall, 2) if wall else None,
+        'success': ok,
+        'errors': requests_total - ok,
+        'status_counts': statuses,
+        'latency_ms': {
+            'mean': round(1000 * sum(latencies) / len(latencies), 3),
+            'p50': round(1000 * percentile(latencies, 0.50), 3),
+            'p90': round(1000 * percentile(latencies, 0.90), 3),
+            'p95': round(1000 * percentile(latencies, 0.95), 3),
+            'p99': round(1000 * percentile(latencies, 0.99), 3),
+            'max': round(1000 * latencies[-1], 3),
+        },
+    }
+
+
+def run(args):
+    settings = MockSettings(args.mock_latency, args.mock_jitter, args.mock_error_rate,
+                            args.mock_error_status, seed=args.seed)
+    mock = start_mock_server(settings)
+    port = args.port or free_port()
+    base_url = f'http://127.0.0.1:{port}'
+    env = {
+        'MISTRAL_ENDPOINT': f'http://127.0.0.1:{mock.server_port}',
+        'MISTRAL_API_KEY': 'benchmark',
+        'MISTRAL_MAX_RETRIES': '0',
+        'CACHE_BACKEND': args.cache_backend,
+    }
+    env.update(dict(item.split('=', 1) for item in args.env))
+    process = start_service(args.server, port, env)
+    try:
+        wait_until_ready(base_url, process)
+        results = []
+        for endpoint in args.endpoints:
+            if args.warmup:
+                run_load(base_url, endpoint, args.warmup, min(args.concurrency, args.warmup))
+            upstream_before = settings.requests
+            result = run_load(base_url, endpoint, args.requests, args.concurrency,
+                              args.rate, args.repeat_inputs)
+            result['upstream_calls'] = settings.requests - upstream_before
+            result['server_rss_kb'] = rss_kb(process.pid)
+            results.append(result)
+        report = {
+            'server': args.server,
+            'mock': {'latency': args.mock_latency, 'jitter': args.mock_jitter,
+                     'error_rate': args.mock_error_rate},
+            'cache_backend': args.cache_backend,
+            'results': results,
+            'server_peak_rss_kb': rss_kb(process.pid, 'VmHWM'),
+            'client_peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        }
+    finally:
+        stop_service(process)
+        mock.shutdown()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--endpoints', nargs='+', default=['chat', 'categorize', 'extract-medical'],
+                        choices=sorted(ENDPOINTS))
+    parser.add_argument('--server', default='dev',
+                        help=f'one of {sorted(SERVERS)} or a full command line reading $PORT')
+    parser.add_argument('--port', type=int, help='service port (default: a free port)')
+    parser.add_argument('--requests', type=int, default=200, help='requests per endpoint')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--rate', type=float, help='target requests per second (open loop)')
+    parser.add_argument('--warmup', type=int, default=10, help='unmeasured requests per endpoint')
+    parser.add_argument('--repeat-inputs', action='store_true',
+                        help='send the same payload every time (measures cache paths)')
+    parser.add_argument('--cache-backend', default='none', choices=['none', 'memory', 'sqlite'])
+    parser.add_argument('--mock-latency', type=float, default=0.2)
+    parser.add_argument('--mock-jitter', type=float, default=0.05)
+    parser.add_argument('--mock-error-rate', type=float, default=0.0)
+    parser.add_argument('--mock-error-status', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--env', nargs='*', default=[], metavar='KEY=VALUE',
+                        help='extra environment variables for the service')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    args = parser.parse_args()
+
+    report = json.dumps(run(args), indent=2)
+    if args.output:
+        with open(args.output, 'w') as output:
+            output.write(report + '\n')
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    main()
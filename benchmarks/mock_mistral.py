@@ -0,0 +1,166 @@
+"""Local stand-in for the Mistral chat completions API.
+
+Serves POST /v1/chat/completions (plain and streaming) with configurable
+latency, jitter and error injection so the Flask service can be benchmarked
+without network access:
+
+    python -m benchmarks.mock_mistral --port 8089 --latency 0.5 --jitter 0.1
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MEDICAL_REPLY = {"age": 60, "gender": "male", "diagnosis": "diabetes", "weight": 210, "smoking": "yes"}
+FILLER = ("Thank you for reaching out. Here is a short answer generated by the "
+          "local mock server for benchmarking purposes. ").split()
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 resets connections under benchmark bursts
+    request_queue_size = 1024
+
+
+class MockSettings:
+    def __init__(self, latency=0.2, jitter=0.05, error_rate=0.0, error_status=500,
+                 reply_words=60, token_interval=0.005, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.reply_words = reply_words
+        self.token_interval = token_interval
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+        self.lock = threading.Lock()
+
+
+def reply_for(prompt, settings):
+    # Shape the answer like the real endpoints expect so parsing paths are exercised
+    if 'JSON schema' in prompt:
+        keys = [key for key in MEDICAL_REPLY if f'"{key}"' in prompt] or list(MEDICAL_REPLY)
+        return json.dumps({key: MEDICAL_REPLY[key] for key in keys})
+    if 'categorize customer inquiries' in prompt:
+        return 'Account Management'
+    return ' '.join(FILLER[i % len(FILLER)] for i in range(settings.reply_words))
+
+
+def make_handler(settings):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            self._send_json(200, {'object': 'list', 'data': [{'id': 'mistral-tiny', 'object': 'model'}]})
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            with settings.lock:
+                settings.requests += 1
+                delay = max(0.0, settings.latency + settings.random.uniform(-settings.jitter, settings.jitter))
+                fail = settings.random.random() < settings.error_rate
+                if fail:
+                    settings.errors += 1
+            time.sleep(delay)
+
+            if fail:
+                self._send_json(settings.error_status, {
+                    'object': 'error', 'message': 'Injected mock failure', 'type': 'mock_error'})
+                return
+
+            prompt = '\n'.join(m.get('content', '') for m in body.get('messages', []))
+            text = reply_for(prompt, settings)
+            max_tokens = body.get('max_tokens')
+            words = text.split(' ')
+            if max_tokens:
+                words = words[:max_tokens]
+                text = ' '.join(words)
+            usage = {
+                'prompt_tokens': len(prompt.split()),
+                'completion_tokens': len(words),
+                'total_tokens': len(prompt.split()) + len(words),
+            }
+            model = body.get('model', 'mistral-tiny')
+            if body.get('stream'):
+                self._stream(model, words, usage)
+            else:
+                self._send_json(200, {
+                    'id': uuid.uuid4().hex, 'object': 'chat.completion', 'created': int(time.time()),
+                    'model': model, 'usage': usage,
+                    'choices': [{'index': 0, 'finish_reason': 'stop',
+                                 'message': {'role': 'assistant', 'content': text}}],
+                })
+
+        def _stream(self, model, words, usage):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            chunk_id = uuid.uuid4().hex
+            for index, word in enumerate(words):
+                last = index == len(words) - 1
+                chunk = {
+                    'id': chunk_id, 'object': 'chat.completion.chunk', 'model': model,
+                    'choices': [{'index': 0, 'delta': {'content': word + ('' if last else ' ')},
+                                 'finish_reason': 'stop' if last else None}],
+                }
+                if last:
+                    chunk['usage'] = usage
+                self.wfile.write(f'data: {json.dumps(chunk)}\n\n'.encode('utf-8'))
+                self.wfile.flush()
+                time.sleep(settings.token_interval)
+            self.wfile.write(b'data: [DONE]\n\n')
+            self.close_connection = True
+
+        def _send_json(self, status, payload):
+            data = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    return Handler
+
+
+def start_mock_server(settings=None, host='127.0.0.1', port=0):
+    # Runs in a daemon thread; port=0 picks a free port (see server.server_port)
+    settings = settings or MockSettings()
+    server = MockServer((host, port), make_handler(settings))
+    server.settings = settings
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency', type=float, default=0.2, help='mean response delay in seconds')
+    parser.add_argument('--jitter', type=float, default=0.05, help='uniform +/- delay in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of calls that fail')
+    parser.add_argument('--error-status', type=int, default=500)
+    parser.add_argument('--reply-words', type=int, default=60)
+    parser.add_argument('--token-interval', type=float, default=0.005, help='delay between streamed tokens')
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    settings = MockSettings(args.latency, args.jitter, args.error_rate, args.error_status,
+                            args.reply_words, args.token_interval, args.seed)
+    server = MockServer((args.host, args.port), make_handler(settings))
+    print(f'Mock Mistral API on http://{args.host}:{args.port}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
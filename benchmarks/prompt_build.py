@@ -0,0 +1,159 @@
+"""Per-request CPU cost of building prompts and their cache key: inline f-strings vs the prompt registry.
+
+    python -m benchmarks.prompt_build --number 20000
+"""
+import argparse
+import json
+import timeit
+
+from mistralai.models.chat_completion import ChatMessage
+
+import medical_rules
+from cache import ResponseCache
+from prompts import PromptRegistry
+
+QUERY = "I think someone has stolen my debit card."
+NOTES = "A 60-year-old male patient presented with increased thirst. He weighs 210 lbs."
+EMAIL = "Dear mortgage lender,\n\nWhat's your 30-year fixed-rate APR?\n\nBest regards,\nJohn"
+NEWSLETTER = "Q3 2023 Market Update\n\nThe third quarter saw significant developments in the tech sector."
+
+
+# How the views built prompts before the registry: one large f-string per request
+def legacy_chat(message):
+    system_message = """You are a helpful customer support assistant. 
+        Provide clear, concise, and friendly responses to customer inquiries. 
+        If you're unsure about something, be honest and suggest escalating to a human agent."""
+    return [ChatMessage(role="system", content=system_message),
+            ChatMessage(role="user", content=message)]
+
+
+def legacy_categorize(query):
+    prompt = f"""
+        You are an AI assistant trained to support a bank's customer service team. Your task is to categorize customer inquiries into one of the 
+        following predefined categories:
+
+        Account Management: Questions related to opening, closing, or managing bank accounts.
+        Transaction Issues: Inquiries about unauthorized charges, failed transactions, or disputes.
+        Loan Services: Requests for information on personal, home, or auto loans.
+        Credit Cards: Queries about credit card applications, benefits, or billing.
+        Online Banking: Issues related to internet banking, mobile app access, or technical support.
+        Fraud and Security: Reports of suspicious activity or questions about account security.
+        General Information: Requests for branch locations, operating hours, or bank policies.
+
+        Given the customer inquiry below, determine the most appropriate category from the list above. If the inquiry doesn't fit any category, 
+        classify it as 'Other'
+
+        Query: {query}
+        """
+    return [ChatMessage(role="user", content=prompt)]
+
+
+def legacy_extract_medical(medical_notes):
+    schema = {name: medical_rules.MEDICAL_SCHEMA[name] for name in medical_rules.MEDICAL_SCHEMA}
+    prompt = f"""
+        Extract information from the following medical notes:
+        {medical_notes}
+        Return json format with the following JSON schema:
+        {json.dumps(schema, indent=2)}
+        """
+    return [ChatMessage(role="user", content=prompt)]
+
+
+def legacy_mortgage(email):
+    prompt = f"""
+        You are a mortgage lender customer service bot, and your task is to
+        create personalized email responses to address customer questions.
+        Answer the customer's inquiry using the provided facts below. Ensure
+        that your response is clear, concise, and directly addresses the
+        customer's question. Address the customer in a friendly and
+        professional manner. Sign the email with "Lender Customer Support."
+
+        # Facts
+        30-year fixed-rate: interest rate 6.403%, APR 6.484%
+        20-year fixed-rate: interest rate 6.329%, APR 6.429%
+        15-year fixed-rate: interest rate 5.705%, APR 5.848%
+        10-year fixed-rate: interest rate 5.500%, APR 5.720%
+        7-year ARM: interest rate 7.011%, APR 7.660%
+        5-year ARM: interest rate 6.880%, APR 7.754%
+        3-year ARM: interest rate 6.125%, APR 7.204%
+        30-year fixed-rate FHA: interest rate 5.527%, APR 6.316%
+        30-year fixed-rate VA: interest rate 5.684%, APR 6.062%
+
+        # Email
+        {email}
+        """
+    return [ChatMessage(role="user", content=prompt)]
+
+
+def legacy_newsletter(newsletter):
+    prompt = f"""
+        You are a commentator. Your task is to write a report on a newsletter.
+        When presented with the newsletter, come up with interesting questions to ask,
+        and answer each question.
+        Afterward, combine all the information and write a report in the markdown
+        format.
+
+        # Newsletter:
+        {newsletter}
+
+        # Instructions:
+        ## Summarize:
+        In clear and concise language, summarize the key points and themes
+        presented in the newsletter.
+        ## Interesting Questions:
+        Generate three distinct and thought-provoking questions that can be
+        asked about the content of the newsletter. For each question:
+        - After "Q: ", describe the problem
+        - After "A: ", provide a detailed explanation of the problem addressed
+        in the question.
+        - Enclose the ultimate answer in <>.
+        ## Write a analysis report
+        Using the summary and the answers to the interesting questions,
+        create a comprehensive report in Markdown format.
+        """
+    return [ChatMessage(role="user", content=prompt)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--number', type=int, default=20000, help='builds per measurement')
+    parser.add_argument('--repeat', type=int, default=5, help='best of N measurements')
+    args = parser.parse_args()
+
+    registry = PromptRegistry()
+    all_fields = tuple(medical_rules.MEDICAL_SCHEMA)
+    cases = {
+        'chat': (lambda: legacy_chat(QUERY),
+                 lambda: registry.get('chat').messages(QUERY)),
+        'categorize': (lambda: legacy_categorize(QUERY),
+                       lambda: registry.get('categorize').messages(QUERY)),
+        'extract-medical': (lambda: legacy_extract_medical(NOTES),
+                            lambda: registry.get('extract-medical', schema=medical_rules.schema_text(all_fields))
+                            .messages(NOTES)),
+        'mortgage-response': (lambda: legacy_mortgage(EMAIL),
+                              lambda: registry.get('mortgage-response').messages(EMAIL)),
+        'analyze-newsletter': (lambda: legacy_newsletter(NEWSLETTER),
+                               lambda: registry.get('analyze-newsletter').messages(NEWSLETTER)),
+    }
+
+    def measure(build):
+        # Every cache miss or hit also hashes the messages into a cache key
+        def request():
+            ResponseCache.make_key(name, 'mistral-tiny', build())
+        best = min(timeit.repeat(request, number=args.number, repeat=args.repeat))
+        return best / args.number * 1e9
+
+    results = {}
+    for name, (legacy, registered) in cases.items():
+        legacy_ns = measure(legacy)
+        registry_ns = measure(registered)
+        results[name] = {
+            'legacy_ns_per_request': round(legacy_ns, 1),
+            'registry_ns_per_request': round(registry_ns, 1),
+            'speedup': round(legacy_ns / registry_ns, 2),
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+"""Replay logged production traffic against the service.
+
+Reads the request log written with TRAFFIC_LOG_ENABLED=true (see traffic.py)
+and sends every logged POST again, keeping the original spacing between
+requests scaled by --speed (2 = twice as fast, 0 = as fast as --concurrency
+allows). Targets a running service with --base-url, or like the harness
+starts the mock Mistral API and the service itself. Prints a JSON report
+comparing replayed and logged latency per endpoint:
+
+    python -m benchmarks.replay --log-dir traffic_log --speed 4 --endpoints chat categorize
+"""
+import argparse
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks.harness import free_port, percentile, start_service, stop_service, wait_until_ready
+from benchmarks.mock_mistral import MockSettings, start_mock_server
+from traffic import read_segments
+
+
+def load_rows(log_dir, endpoints=None, since=None, limit=None):
+    rows = [row for row in read_segments(log_dir, endpoints=endpoints, since=since)
+            if row['request'] is not None]
+    # Segments from several workers interleave; replay in logged order
+    rows.sort(key=lambda row: row['ts'])
+    return rows[:limit] if limit else rows
+
+
+def latency_summary(latencies_ms):
+    if not latencies_ms:
+        return None
+    latencies_ms = sorted(latencies_ms)
+    return {
+        'mean': round(sum(latencies_ms) / len(latencies_ms), 3),
+        'p50': round(percentile(latencies_ms, 0.50), 3),
+        'p95': round(percentile(latencies_ms, 0.95), 3),
+        'p99': round(percentile(latencies_ms, 0.99), 3),
+    }
+
+
+def replay(base_url, rows, speed=1.0, concurrency=64):
+    local = threading.local()
+    lock = threading.Lock()
+    results = {}
+    first_ts = rows[0]['ts'] if rows else 0
+    start = time.perf_counter()
+
+    def session():
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        return local.session
+
+    def one(row):
+        if speed:
+            delay = start + (row['ts'] - first_ts) / speed - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        sent = time.perf_counter()
+        try:
+            response = session().post(f"{base_url}/{row['endpoint']}", data=row['request'],
+                                      headers={'Content-Type': 'application/json'}, timeout=300)
+            response.content
+            status = response.status_code
+        except requests.exceptions.RequestException as e:
+            status = type(e).__name__
+        elapsed_ms = 1000 * (time.perf_counter() - sent)
+        with lock:
+            result = results.setdefault(row['endpoint'], {
+                'latencies': [], 'logged': [], 'statuses': {}, 'status_changed': 0})
+            result['latencies'].append(elapsed_ms)
+            if row['latency_ms'] is not None:
+                result['logged'].append(row['latency_ms'])
+            result['statuses'][str(status)] = result['statuses'].get(str(status), 0) + 1
+            result['status_changed'] += status != row['status']
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, rows))
+    wall = time.perf_counter() - start
+
+    return {
+        'requests': len(rows),
+        'wall_seconds': round(wall, 4),
+        'throughput_rps': round(len(rows) / wall, 2) if wall else None,
+        'logged_span_seconds': round(rows[-1]['ts'] - first_ts, 4) if rows else 0,
+        'endpoints': {
+            endpoint: {
+                'requests': len(result['latencies']),
+                'status_counts': result['statuses'],
+                'status_changed': result['status_changed'],
+                'latency_ms': latency_summary(result['latencies']),
+                'logged_latency_ms': latency_summary(result['logged']),
+            }
+            for endpoint, result in sorted(results.items())
+        },
+    }
+
+
+def run(args):
+    rows = load_rows(args.log_dir, args.endpoints, args.since, args.limit)
+    if not rows:
+        raise SystemExit(f'No logged requests found in {args.log_dir}')
+    if args.base_url:
+        return {'base_url': args.base_url, 'speed': args.speed,
+                **replay(args.base_url.rstrip('/'), rows, args.speed, args.concurrency)}
+
+    settings = MockSettings(args.mock_latency, args.mock_jitter, 0.0, 500, seed=args.seed)
+    mock = start_mock_server(settings)
+    port = free_port()
+    base_url = f'http://127.0.0.1:{port}'
+    env = {
+        'MISTRAL_ENDPOINT': f'http://127.0.0.1:{mock.server_port}',
+        'MISTRAL_API_KEY': 'benchmark',
+        'MISTRAL_MAX_RETRIES': '0',
+        'CACHE_BACKEND': args.cache_backend,
+        # Replayed traffic must not be logged again
+        'TRAFFIC_LOG_ENABLED': 'false',
+    }
+    env.update(dict(item.split('=', 1) for item in args.env))
+    process = start_service(args.server, port, env)
+    try:
+        wait_until_ready(base_url, process)
+        report = {'server': args.server, 'speed': args.speed, 'cache_backend': args.cache_backend,
+                  **replay(base_url, rows, args.speed, args.concurrency)}
+        report['upstream_calls'] = settings.requests
+    finally:
+        stop_service(process)
+        mock.shutdown()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--log-dir', default='traffic_log', help='TRAFFIC_LOG_DIR of the logged service')
+    parser.add_argument('--endpoints', nargs='+', help='only replay these endpoints, e.g. chat categorize/batch')
+    parser.add_argument('--since', type=float, help='only requests logged after this Unix time')
+    parser.add_argument('--limit', type=int, help='replay at most this many requests')
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help='time compression of the logged spacing; 0 sends as fast as possible')
+    parser.add_argument('--concurrency', type=int, default=64, help='most requests in flight at once')
+    parser.add_argument('--base-url', help='replay against this running service instead of starting one')
+    parser.add_argument('--server', default='dev', help='service to start when --base-url is not given')
+    parser.add_argument('--cache-backend', default='memory', choices=['none', 'memory', 'sqlite'])
+    parser.add_argument('--mock-latency', type=float, default=0.2)
+    parser.add_argument('--mock-jitter', type=float, default=0.05)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--env', nargs='*', default=[], metavar='KEY=VALUE',
+                        help='extra environment variables for the service')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    args = parser.parse_args()
+
+    report = json.dumps(run(args), indent=2)
+    if args.output:
+        with open(args.output, 'w') as output:
+            output.write(report + '\n')
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_text(text):
+    # Collapse the indentation/newline noise that comes from triple-quoted prompts
+    return _WHITESPACE.sub(' ', text or '').strip()
+
+
+# System prefixes come from the prompt registry and repeat on every request
+_normalize_static = lru_cache(maxsize=256)(normalize_text)
+
+
+class MemoryBackend:
+    """In-process LRU store bounded by entry count and total value size."""
+
+    def __init__(self, max_entries=1024, max_bytes=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, value, expires_at):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[0])
+            self._entries[key] = (value, expires_at)
+            self._bytes += len(value)
+            self._evict()
+
+    def delete(self, key):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[0])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _evict(self):
+        while self._entries and (
+            len(self._entries) > self.max_entries
+            or (self.max_bytes is not None and self._bytes > self.max_bytes)
+        ):
+            _, (value, _) = self._entries.popitem(last=False)
+            self._bytes -= len(value)
+
+
+class SQLiteBackend:
+    """Local-disk store that survives restarts, evicting least recently used rows."""
+
+    def __init__(self, path, max_entries=10000):
+        self.path = path
+        self.max_entries = max_entries
+        self._connect()
+        # Connections must not cross a fork (gunicorn preload_app); children reopen
+        os.register_at_fork(after_in_child=self._connect)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS response_cache ('
+            'key TEXT PRIMARY KEY, value TEXT NOT NULL, '
+            'expires_at REAL NOT NULL, last_access REAL NOT NULL)'
+        )
+        self._conn.execute(
+            'CREATE INDEX IF NOT EXISTS response_cache_lru ON response_cache (last_access)'
+        )
+        self._conn.commit()
+
+    def _connect(self):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT value, expires_at FROM response_cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is not None:
+                self._conn.execute(
+                    'UPDATE response_cache SET last_access = ? WHERE key = ?',
+                    (time.time(), key)
+                )
+                self._conn.commit()
+            return row
+
+    def set(self, key, value, expires_at):
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO response_cache VALUES (?, ?, ?, ?)',
+                (key, value, expires_at, time.time())
+            )
+            self._conn.execute(
+                'DELETE FROM response_cache WHERE key IN ('
+                'SELECT key FROM response_cache ORDER BY last_access DESC '
+                'LIMIT -1 OFFSET ?)',
+                (self.max_entries,)
+            )
+            self._conn.commit()
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute('DELETE FROM response_cache WHERE key = ?', (key,))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM response_cache')
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM response_cache').fetchone()[0]
+
+
+class StaleValue(str):
+    """A cached answer served past its TTL; callers flag it in their response."""
+    stale = True
+
+
+class ResponseCache:
+    """Caches model answers keyed on (endpoint, model, normalized messages, options).
+
+    Expired answers are kept for another `stale_ttl` seconds so get_stale() can
+    still serve them when the model is unavailable.
+    """
+
+    def __init__(self, backend, ttls=None, default_ttl=300, stale_ttl=0):
+        self.backend = backend
+        self.ttls = ttls or {}
+        self.default_ttl = default_ttl
+        self.stale_ttl = stale_ttl
+        self.hits = {}
+        self.misses = {}
+        self.stale_hits = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(endpoint, model, messages, options=None):
+        payload = json.dumps({
+            'endpoint': endpoint,
+            'model': model,
+            'messages': [
+                (m.role, _normalize_static(m.content) if m.role == 'system' else normalize_text(m.content))
+                for m in messages
+            ],
+            'options': options or {},
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def ttl_for(self, endpoint):
+        return self.ttls.get(endpoint, self.default_ttl)
+
+    def get(self, endpoint, key):
+        value = None
+        if self.ttl_for(endpoint) > 0:
+            entry = self.backend.get(key)
+            if entry is not None:
+                now = time.time()
+                if entry[1] > now:
+                    value = entry[0]
+                elif entry[1] + self.stale_ttl <= now:
+                    self.backend.delete(key)
+        self._count(self.hits if value is not None else self.misses, endpoint)
+        return value
+
+    def get_stale(self, endpoint, key):
+        # Fresh or expired-but-retained answer, for when the model cannot be reached
+        entry = self.backend.get(key) if self.ttl_for(endpoint) > 0 else None
+        if entry is None or entry[1] + self.stale_ttl <= time.time():
+            return None
+        self._count(self.stale_hits, endpoint)
+        return StaleValue(entry[0])
+
+    def set(self, endpoint, key, value):
+        ttl = self.ttl_for(endpoint)
+        # An empty completion is a failed call, never an answer worth repeating
+        if ttl > 0 and value:
+            self.backend.set(key, value, time.time() + ttl)
+
+    def stats(self):
+        with self._lock:
+            endpoints = sorted(set(self.hits) | set(self.misses) | set(self.stale_hits))
+            return {
+                'entries': len(self.backend),
+                'hits': sum(self.hits.values()),
+                'misses': sum(self.misses.values()),
+                'stale_hits': sum(self.stale_hits.values()),
+                'endpoints': {
+                    name: {'hits': self.hits.get(name, 0), 'misses': self.misses.get(name, 0),
+                           'stale_hits': self.stale_hits.get(name, 0)}
+                    for name in endpoints
+                },
+            }
+
+    def _count(self, counter, endpoint):
+        with self._lock:
+            counter[endpoint] = counter.get(endpoint, 0) + 1
+
+
+def create_cache(config):
+    if config.CACHE_BACKEND == 'sqlite':
+        backend = SQLiteBackend(config.CACHE_PATH, max_entries=config.CACHE_MAX_ENTRIES)
+    else:
+        backend = MemoryBackend(
+            max_entries=config.CACHE_MAX_ENTRIES,
+            max_bytes=config.CACHE_MAX_BYTES
+        )
+    ttls = dict(config.CACHE_TTLS)
+    if config.CACHE_BACKEND == 'none':
+        ttls = {endpoint: 0 for endpoint in ttls}
+        default_ttl = 0
+    else:
+        default_ttl = config.CACHE_DEFAULT_TTL
+    return ResponseCache(backend, ttls=ttls, default_ttl=default_ttl, stale_ttl=config.CACHE_STALE_TTL)
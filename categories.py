@@ -0,0 +1,51 @@
+import re
+
+# The fixed label set /categorize chooses from, in prompt order
+CATEGORIES = (
+    'Account Management',
+    'Transaction Issues',
+    'Loan Services',
+    'Credit Cards',
+    'Online Banking',
+    'Fraud and Security',
+    'General Information',
+    'Other',
+)
+
+# Other phrasings models use for a category; matched after the exact names
+ALIASES = {
+    'Account Management': ('account management', 'account services', 'accounts'),
+    'Transaction Issues': ('transaction issue', 'transactions', 'transaction'),
+    'Loan Services': ('loan service', 'loans', 'loan', 'mortgage'),
+    'Credit Cards': ('credit card', 'card services'),
+    'Online Banking': ('online banking', 'mobile banking', 'internet banking', 'digital banking'),
+    'Fraud and Security': ('fraud & security', 'fraud', 'security'),
+    'General Information': ('general info', 'general inquiry', 'general'),
+    'Other': ('other', 'none', 'uncategorized'),
+}
+
+_EXACT = {category.lower(): category for category in CATEGORIES}
+_PUNCTUATION = ' \t\r\n."\'*`:'
+_NAMES = re.compile(
+    r'\b(' + '|'.join(re.escape(category.lower()) for category in CATEGORIES) + r')\b')
+_ALIASES = re.compile(
+    r'\b(' + '|'.join(sorted((re.escape(alias) for aliases in ALIASES.values() for alias in aliases),
+                            key=len, reverse=True)) + r')\b')
+_BY_ALIAS = {alias: category for category, aliases in ALIASES.items() for alias in aliases}
+
+
+def match_category(text):
+    """Canonical label for a model answer, or None when it names no known category.
+
+    A bare label is a dict lookup; otherwise the earliest full category name
+    wins, then the earliest alias, each found with a single precompiled regex.
+    """
+    lowered = (text or '').strip(_PUNCTUATION).lower()
+    category = _EXACT.get(lowered)
+    if category is not None:
+        return category
+    match = _NAMES.search(lowered)
+    if match:
+        return _EXACT[match.group(1)]
+    match = _ALIASES.search(lowered)
+    return _BY_ALIAS[match.group(1)] if match else None
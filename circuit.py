@@ -0,0 +1,128 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpen(Exception):
+    def __init__(self, retry_after):
+        super().__init__('Model service unavailable, try again later')
+        self.retry_after = retry_after
+
+
+def is_upstream_failure(error):
+    # Outages, timeouts, 5xx and 429 count; a rejected request (other 4xx) says nothing about upstream health
+    status = getattr(error, 'http_status', None)
+    return status is None or status >= 500 or status == 429
+
+
+class CircuitBreaker:
+    """Fails model calls fast while the upstream is failing.
+
+    Closed: calls go through and outcomes are kept for the last `window` seconds.
+    Once at least `min_calls` were made and `failure_rate` of them failed, the
+    circuit opens and every call raises CircuitOpen right away. After
+    `open_seconds` it goes half-open and lets `probes` calls through: all of
+    them succeeding closes the circuit, any failure opens it again. Exceptions in
+    `ignore` (and interrupted calls) count neither way.
+    """
+
+    def __init__(self, failure_rate=0.5, min_calls=10, window=30, open_seconds=15, probes=1, ignore=()):
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.open_seconds = open_seconds
+        self.probes = probes
+        self.ignore = ignore
+        self.state = CLOSED
+        self.opened = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+        self._outcomes = deque()
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = 0
+        self._probe_successes = 0
+
+    @contextmanager
+    def guard(self):
+        probe = self._enter()
+        try:
+            yield
+        except Exception as e:
+            self._exit(probe, failed=None if isinstance(e, self.ignore) else is_upstream_failure(e))
+            raise
+        except BaseException:
+            self._exit(probe, failed=None)
+            raise
+        self._exit(probe, failed=False)
+
+    def _enter(self):
+        with self._lock:
+            now = time.monotonic()
+            if self.state == OPEN:
+                remaining = self._opened_at + self.open_seconds - now
+                if remaining > 0:
+                    self.rejected += 1
+                    raise CircuitOpen(remaining)
+                self.state = HALF_OPEN
+                self._probing = 0
+                self._probe_successes = 0
+            if self.state == HALF_OPEN:
+                if self._probing >= self.probes:
+                    self.rejected += 1
+                    raise CircuitOpen(1.0)
+                self._probing += 1
+                return True
+            return False
+
+    def _exit(self, probe, failed):
+        # failed is None when the call says nothing about upstream health
+        with self._lock:
+            now = time.monotonic()
+            if probe:
+                if self.state != HALF_OPEN:
+                    return
+                self._probing -= 1
+                if failed is None:
+                    return
+                if failed:
+                    self._trip(now)
+                else:
+                    self._probe_successes += 1
+                    if self._probe_successes >= self.probes:
+                        self.state = CLOSED
+                        self._outcomes.clear()
+                        self._failures = 0
+                return
+            if failed is None:
+                return
+
+            self._outcomes.append((now, failed))
+            self._failures += failed
+            while self._outcomes and self._outcomes[0][0] < now - self.window:
+                self._failures -= self._outcomes.popleft()[1]
+            if (self.state == CLOSED and len(self._outcomes) >= self.min_calls
+                    and self._failures >= self.failure_rate * len(self._outcomes)):
+                self._trip(now)
+
+    def _trip(self, now):
+        self.state = OPEN
+        self.opened += 1
+        self._opened_at = now
+        self._outcomes.clear()
+        self._failures = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'state': self.state,
+                'opened': self.opened,
+                'rejected': self.rejected,
+                'recent_calls': len(self._outcomes),
+                'recent_failures': self._failures,
+            }
@@ -0,0 +1,243 @@
+import fcntl
+import json
+import os
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+
+import numpy as np
+
+from similarity import text_features
+
+
+def featurize(text, dim):
+    # Hashed word and character n-grams, sublinear counts, L2-normalized
+    counts = {}
+    for feature in text_features(text):
+        index = zlib.crc32(feature.encode('utf-8')) % dim
+        counts[index] = counts.get(index, 0) + 1
+    if not counts:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+    values = 1.0 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+    return indices, values / np.linalg.norm(values)
+
+
+def train(pairs, labels, dim=1 << 15, epochs=30, batch_size=64, learning_rate=10.0, l2=1e-5, seed=0):
+    """Softmax regression over hashed features, trained with minibatch SGD.
+
+    Gradients are accumulated only into the rows of the weight matrix that a
+    batch's features touch, so a step costs O(non-zeros x classes).
+    """
+    label_index = {label: i for i, label in enumerate(labels)}
+    examples = [featurize(query, dim) for query, _ in pairs]
+    targets = np.array([label_index[label] for _, label in pairs], dtype=np.int64)
+    weights = np.zeros((dim, len(labels)), dtype=np.float32)
+    bias = np.zeros(len(labels), dtype=np.float32)
+    rng = np.random.default_rng(seed)
+
+    for epoch in range(epochs):
+        step = learning_rate / (1.0 + epoch * 0.2)
+        order = rng.permutation(len(examples))
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            rows = np.concatenate([np.full(examples[i][0].size, r) for r, i in enumerate(batch)])
+            cols = np.concatenate([examples[i][0] for i in batch])
+            vals = np.concatenate([examples[i][1] for i in batch])
+
+            logits = np.tile(bias, (len(batch), 1))
+            np.add.at(logits, rows, vals[:, None] * weights[cols])
+            probs = softmax(logits)
+            probs[np.arange(len(batch)), targets[batch]] -= 1.0
+            probs /= len(batch)
+
+            grad = np.zeros_like(weights)
+            np.add.at(grad, cols, vals[:, None] * probs[rows])
+            touched = np.unique(cols)
+            weights[touched] -= step * (grad[touched] + l2 * weights[touched])
+            bias -= step * probs.sum(axis=0)
+    return weights, bias
+
+
+def softmax(logits):
+    logits = logits - logits.max(axis=-1, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+
+@contextmanager
+def file_lock(path, blocking=True):
+    # Advisory lock shared by every worker process; yields False if busy and not blocking
+    with open(path, 'a') as handle:
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+class LocalClassifier:
+    """Serves /categorize from a trained artifact, reloading it when the file changes.
+
+    Model labels are appended to a JSONL log; once enough new ones arrive a
+    background thread retrains on the latest `max_examples` distinct queries and
+    atomically replaces the .npz artifact. Worker processes share the log and
+    the artifact: one trains at a time, the log is compacted to those queries
+    once it holds twice as many lines, and a retrain is skipped until the log
+    has `retrain_every` lines more than the current artifact was trained on.
+    """
+
+    def __init__(self, model_path, log_path, min_confidence=0.9, min_examples=200,
+                 retrain_every=200, max_examples=2000, labels=None, dim=1 << 15, reload_interval=5.0):
+        self.model_path = model_path
+        self.log_path = log_path
+        self.min_confidence = min_confidence
+        self.min_examples = min_examples
+        self.retrain_every = retrain_every
+        self.max_examples = max_examples
+        self.labels = tuple(labels or ())
+        self.dim = dim
+        self.reload_interval = reload_interval
+        self.predictions = 0
+        self.confident = 0
+        self._model = None
+        self._mtime = None
+        self._checked_at = 0.0
+        self._new_labels = 0
+        self._training = False
+        self._lock = threading.Lock()
+        self._log_lock = threading.Lock()
+        self.reload(force=True)
+
+    def reload(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.reload_interval:
+            return
+        self._checked_at = now
+        try:
+            mtime = os.stat(self.model_path).st_mtime
+        except OSError:
+            return
+        if mtime == self._mtime:
+            return
+        with np.load(self.model_path, allow_pickle=False) as artifact:
+            model = (artifact['weights'], artifact['bias'], tuple(artifact['labels']),
+                     int(artifact['examples']),
+                     int(artifact['log_lines']) if 'log_lines' in artifact.files else 0)
+        with self._lock:
+            self._model, self._mtime = model, mtime
+
+    def predict(self, query):
+        # Returns (label, confidence) when the classifier is sure enough, else None
+        self.reload()
+        model = self._model
+        if model is None:
+            return None
+        weights, bias, labels = model[:3]
+        indices, values = featurize(query, weights.shape[0])
+        if indices.size == 0:
+            return None
+        probs = softmax(values @ weights[indices] + bias)
+        best = int(np.argmax(probs))
+        confidence = float(probs[best])
+        with self._lock:
+            self.predictions += 1
+            if confidence < self.min_confidence:
+                return None
+            self.confident += 1
+        return labels[best], confidence
+
+    def record(self, query, label):
+        # Only canonical model labels are logged, never the classifier's own answers
+        line = json.dumps({'query': query, 'label': label}) + '\n'
+        with self._log_lock, file_lock(self.log_path + '.lock'):
+            with open(self.log_path, 'a', encoding='utf-8') as log:
+                log.write(line)
+        with self._lock:
+            self._new_labels += 1
+            if self._training or self._new_labels < self.retrain_every:
+                return
+            self._training = True
+            self._new_labels = 0
+        threading.Thread(target=self._retrain, name='classifier-train').start()
+
+    def load_pairs(self):
+        # The latest max_examples distinct queries, oldest first
+        with self._log_lock, file_lock(self.log_path + '.lock'):
+            return self._read_log()[0]
+
+    def _read_log(self):
+        pairs = {}
+        lines = 0
+        if not os.path.exists(self.log_path):
+            return [], 0
+        with open(self.log_path, encoding='utf-8') as log:
+            for line in log:
+                lines += 1
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                # Latest label wins for repeated queries, and moves the query to the end
+                key = entry['query'].strip().lower()
+                pairs.pop(key, None)
+                pairs[key] = (entry['query'], entry['label'])
+        return list(pairs.values())[-self.max_examples:], lines
+
+    def _compact_log(self, pairs):
+        tmp_path = f'{self.log_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as log:
+            for query, label in pairs:
+                log.write(json.dumps({'query': query, 'label': label}) + '\n')
+        os.replace(tmp_path, self.log_path)
+
+    def _retrain(self):
+        try:
+            with file_lock(self.model_path + '.lock', blocking=False) as acquired:
+                if not acquired:
+                    # Another worker process is already training on the shared log
+                    return
+                self._train_shared()
+        finally:
+            with self._lock:
+                self._training = False
+
+    def _train_shared(self):
+        with self._log_lock, file_lock(self.log_path + '.lock'):
+            pairs, lines = self._read_log()
+            if lines > 2 * self.max_examples:
+                # Appends wait on the same lock, so none are lost to the rewrite
+                self._compact_log(pairs)
+                lines = len(pairs)
+        self.reload(force=True)
+        trained_lines = self._model[4] if self._model is not None else 0
+        if 0 <= lines - trained_lines < self.retrain_every:
+            # Another worker trained on these labels already
+            return
+        labels = self.labels or tuple(sorted({label for _, label in pairs}))
+        pairs = [(query, label) for query, label in pairs if label in labels]
+        if len(pairs) < self.min_examples or len({label for _, label in pairs}) < 2:
+            return
+        weights, bias = train(pairs, labels, dim=self.dim)
+        tmp_path = f'{self.model_path}.{os.getpid()}.tmp.npz'
+        np.savez(tmp_path, weights=weights, bias=bias, labels=np.array(labels),
+                 examples=np.array(len(pairs)), log_lines=np.array(lines))
+        os.replace(tmp_path, self.model_path)
+        self.reload(force=True)
+
+    def stats(self):
+        with self._lock:
+            model = self._model
+            return {
+                'loaded': model is not None,
+                'examples': model[3] if model is not None else 0,
+                'min_confidence': self.min_confidence,
+                'predictions': self.predictions,
+                'confident': self.confident,
+                'confident_rate': self.confident / self.predictions if self.predictions else 0.0,
+            }
@@ -5,4 +5,174 @@ load_dotenv()
 
 class Config:
     MISTRAL_API_KEY = os.getenv('MISTRAL_API_KEY')
-    CHAT_MODEL = "mistral-tiny"  # You can change this to other models like "mistral-small" or "mistral-medium" 
\ No newline at end of file
+    CHAT_MODEL = "mistral-tiny"  # You can change this to other models like "mistral-small" or "mistral-medium"
+
+    # Model tiers, smallest and fastest first; endpoints start on their route and escalate upward
+    MODEL_TIERS = [m.strip() for m in os.getenv('MODEL_TIERS', 'mistral-tiny,mistral-small,mistral-medium').split(',')]
+    MODEL_ROUTES = {
+        name: os.getenv(f"MODEL_{name.upper().replace('-', '_')}", default)
+        for name, default in (
+            ('chat', CHAT_MODEL),
+            ('categorize', 'mistral-tiny'),
+            ('extract-medical', 'mistral-tiny'),
+            ('mortgage-response', 'mistral-tiny'),
+            ('analyze-newsletter', 'mistral-small'),
+            ('newsletter-chunk', 'mistral-tiny'),
+            ('chat-summary', 'mistral-tiny'),
+        )
+    }
+    # Non-system input longer than this starts one tier up
+    MODEL_ESCALATE_CHARS = int(os.getenv('MODEL_ESCALATE_CHARS', '8000'))
+    # Price per million (prompt, completion) tokens, for the model_cost_total metric
+    MODEL_PRICES = {
+        'mistral-tiny': (0.14, 0.42),
+        'mistral-small': (0.6, 1.8),
+        'mistral-medium': (2.5, 7.5),
+    }
+    # Point MISTRAL_ENDPOINT at benchmarks/mock_mistral.py to run without network access
+    MISTRAL_ENDPOINT = os.getenv('MISTRAL_ENDPOINT', 'https://api.mistral.ai')
+    # The client's own retries (which wait out Retry-After) would hide 429s and outages from the
+    # scheduler's adaptive limit and the circuit breaker while holding a slot, so they are off
+    MISTRAL_MAX_RETRIES = int(os.getenv('MISTRAL_MAX_RETRIES', '0'))
+    MISTRAL_TIMEOUT = int(os.getenv('MISTRAL_TIMEOUT', '120'))
+
+    # Response cache: 'memory' (in-process LRU), 'sqlite' (local disk) or 'none'
+    CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'memory')
+    CACHE_PATH = os.getenv('CACHE_PATH', 'response_cache.sqlite3')
+    CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', '1024'))
+    CACHE_MAX_BYTES = int(os.getenv('CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+    CACHE_DEFAULT_TTL = int(os.getenv('CACHE_DEFAULT_TTL', '300'))
+    # Seconds a cached answer stays fresh per endpoint; 0 disables caching for it
+    CACHE_TTLS = {
+        'chat': int(os.getenv('CACHE_TTL_CHAT', '300')),
+        'categorize': int(os.getenv('CACHE_TTL_CATEGORIZE', '86400')),
+        'extract-medical': int(os.getenv('CACHE_TTL_EXTRACT_MEDICAL', '86400')),
+        'mortgage-response': int(os.getenv('CACHE_TTL_MORTGAGE_RESPONSE', '3600')),
+        'analyze-newsletter': int(os.getenv('CACHE_TTL_ANALYZE_NEWSLETTER', '3600')),
+        # Keyed on the chunk text, so unchanged sections of an edited newsletter are reused
+        'newsletter-chunk': int(os.getenv('CACHE_TTL_NEWSLETTER_CHUNK', '86400')),
+    }
+    # Expired answers are kept this much longer and served, flagged stale, while the model is down
+    CACHE_STALE_TTL = int(os.getenv('CACHE_STALE_TTL', '86400'))
+
+    # Near-duplicate lookup for /categorize; queries scoring above the threshold skip the model
+    SEMANTIC_CACHE_ENABLED = os.getenv('SEMANTIC_CACHE_ENABLED', 'true').lower() == 'true'
+    SEMANTIC_CACHE_THRESHOLD = float(os.getenv('SEMANTIC_CACHE_THRESHOLD', '0.75'))
+    SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv('SEMANTIC_CACHE_MAX_ENTRIES', '2000'))
+
+    # Batch endpoints share one bounded pool of upstream calls
+    BATCH_CONCURRENCY = int(os.getenv('BATCH_CONCURRENCY', '8'))
+    BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', '1000'))
+
+    # Debugger and reloader for `python main.py`; never enable in production
+    DEBUG = os.getenv('FLASK_DEBUG', 'false').lower() == 'true'
+
+    # Cooperative (gevent) serving mode, see async_server.py
+    PORT = int(os.getenv('PORT', '5000'))
+    ASYNC_HOST = os.getenv('ASYNC_HOST', '0.0.0.0')
+    ASYNC_MAX_CONNECTIONS = int(os.getenv('ASYNC_MAX_CONNECTIONS', '1000'))
+    ASYNC_SHUTDOWN_TIMEOUT = int(os.getenv('ASYNC_SHUTDOWN_TIMEOUT', '30'))
+
+    # Resolve /extract-medical fields with local rules before asking the model
+    MEDICAL_RULES_ENABLED = os.getenv('MEDICAL_RULES_ENABLED', 'true').lower() == 'true'
+
+    # Prompt template version per endpoint (files in prompts/); unset means the latest
+    PROMPT_VERSIONS = {
+        name: os.getenv(f"PROMPT_VERSION_{name.upper().replace('-', '_')}")
+        for name in ('chat', 'categorize', 'extract-medical', 'mortgage-response', 'analyze-newsletter',
+                     'newsletter-chunk', 'newsletter-reduce', 'chat-summary')
+        if os.getenv(f"PROMPT_VERSION_{name.upper().replace('-', '_')}")
+    }
+
+    # Concurrent identical model calls wait on one upstream request
+    SINGLE_FLIGHT_ENABLED = os.getenv('SINGLE_FLIGHT_ENABLED', 'true').lower() == 'true'
+
+    # Model call scheduler: lower priority numbers go first when calls queue up
+    SCHEDULER_PRIORITIES = {
+        'chat': 0,
+        'categorize': 0,
+        'extract-medical': 1,
+        'mortgage-response': 1,
+        'analyze-newsletter': 2,
+        'newsletter-chunk': 2,
+        'chat-summary': 2,
+    }
+    # Cap on the share of the concurrency limit the bulk class may hold
+    SCHEDULER_CLASS_SHARES = {2: float(os.getenv('SCHEDULER_BULK_SHARE', '0.5'))}
+    SCHEDULER_INITIAL_LIMIT = int(os.getenv('SCHEDULER_INITIAL_LIMIT', '8'))
+    SCHEDULER_MIN_LIMIT = int(os.getenv('SCHEDULER_MIN_LIMIT', '1'))
+    SCHEDULER_MAX_LIMIT = int(os.getenv('SCHEDULER_MAX_LIMIT', '64'))
+    SCHEDULER_QUEUE_TIMEOUT = float(os.getenv('SCHEDULER_QUEUE_TIMEOUT', '30'))
+    # Upstream quota in requests per second; 0 leaves it to the adaptive limit alone
+    UPSTREAM_RATE_LIMIT = float(os.getenv('UPSTREAM_RATE_LIMIT', '0'))
+    UPSTREAM_BURST = int(os.getenv('UPSTREAM_BURST', '5'))
+
+    # Background jobs for long /analyze-newsletter runs; 'sqlite' shares results across workers
+    JOB_STORE = os.getenv('JOB_STORE', 'memory')
+    JOB_STORE_PATH = os.getenv('JOB_STORE_PATH', 'jobs.sqlite3')
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', '4'))
+    JOB_MAX_PENDING = int(os.getenv('JOB_MAX_PENDING', '1000'))
+    JOB_RESULT_TTL = int(os.getenv('JOB_RESULT_TTL', '3600'))
+    JOB_MAX_WAIT = float(os.getenv('JOB_MAX_WAIT', '30'))
+    # Unfinished jobs (e.g. their worker was recycled) read as failed this long after submission
+    JOB_MAX_RUNTIME = int(os.getenv('JOB_MAX_RUNTIME', '900'))
+
+    # Newsletters longer than this are summarized per chunk, then reduced into one report
+    NEWSLETTER_SINGLE_PASS_CHARS = int(os.getenv('NEWSLETTER_SINGLE_PASS_CHARS', '16000'))
+    NEWSLETTER_CHUNK_CHARS = int(os.getenv('NEWSLETTER_CHUNK_CHARS', '6000'))
+    # Chunk summaries run on their own pool, so they never queue behind a batch request (or it behind them)
+    NEWSLETTER_CHUNK_CONCURRENCY = int(os.getenv('NEWSLETTER_CHUNK_CONCURRENCY', '4'))
+
+    # Local /categorize classifier trained in the background from logged model labels
+    CLASSIFIER_ENABLED = os.getenv('CLASSIFIER_ENABLED', 'true').lower() == 'true'
+    CLASSIFIER_MODEL_PATH = os.getenv('CLASSIFIER_MODEL_PATH', 'category_model.npz')
+    CLASSIFIER_LOG_PATH = os.getenv('CLASSIFIER_LOG_PATH', 'category_labels.jsonl')
+    CLASSIFIER_MIN_CONFIDENCE = float(os.getenv('CLASSIFIER_MIN_CONFIDENCE', '0.9'))
+    CLASSIFIER_MIN_EXAMPLES = int(os.getenv('CLASSIFIER_MIN_EXAMPLES', '200'))
+    CLASSIFIER_RETRAIN_EVERY = int(os.getenv('CLASSIFIER_RETRAIN_EVERY', '200'))
+    # Retraining uses only the latest this many distinct queries, bounding its cost
+    CLASSIFIER_MAX_EXAMPLES = int(os.getenv('CLASSIFIER_MAX_EXAMPLES', '2000'))
+
+    # Output cap for /categorize, which only needs the label itself
+    CATEGORIZE_MAX_TOKENS = int(os.getenv('CATEGORIZE_MAX_TOKENS', '8'))
+
+    # Follow-up requests for /extract-medical fields that fail schema validation
+    MEDICAL_MAX_RETRIES = int(os.getenv('MEDICAL_MAX_RETRIES', '1'))
+
+    # Answer emails that only ask for listed rates from the rate table, without the model
+    MORTGAGE_DIRECT_ANSWERS = os.getenv('MORTGAGE_DIRECT_ANSWERS', 'true').lower() == 'true'
+
+    # Multi-turn /chat sessions; history past the token budget is summarized in the background
+    CHAT_SESSION_STORE = os.getenv('CHAT_SESSION_STORE', 'memory')
+    CHAT_SESSION_PATH = os.getenv('CHAT_SESSION_PATH', 'chat_sessions.sqlite3')
+    CHAT_SESSION_MAX_SESSIONS = int(os.getenv('CHAT_SESSION_MAX_SESSIONS', '10000'))
+    CHAT_SESSION_MAX_BYTES = int(os.getenv('CHAT_SESSION_MAX_BYTES', str(32 * 1024 * 1024)))
+    CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv('CHAT_HISTORY_TOKEN_BUDGET', '1500'))
+    CHAT_KEEP_RECENT = int(os.getenv('CHAT_KEEP_RECENT', '6'))
+
+    # Hedged requests: a duplicate upstream call when the first is slower than the
+    # HEDGE_QUANTILE of recent calls, capped at about HEDGE_BUDGET extra load
+    HEDGE_ENABLED = os.getenv('HEDGE_ENABLED', 'false').lower() == 'true'
+    HEDGE_ENDPOINTS = [e.strip() for e in os.getenv('HEDGE_ENDPOINTS', 'chat,categorize').split(',')]
+    HEDGE_QUANTILE = float(os.getenv('HEDGE_QUANTILE', '0.95'))
+    HEDGE_BUDGET = float(os.getenv('HEDGE_BUDGET', '0.05'))
+    HEDGE_MIN_SAMPLES = int(os.getenv('HEDGE_MIN_SAMPLES', '20'))
+
+    # Circuit breaker around the model client: fail fast once CIRCUIT_FAILURE_RATE of the
+    # calls in the last CIRCUIT_WINDOW seconds failed, then probe again after CIRCUIT_OPEN_SECONDS
+    CIRCUIT_ENABLED = os.getenv('CIRCUIT_ENABLED', 'true').lower() == 'true'
+    CIRCUIT_FAILURE_RATE = float(os.getenv('CIRCUIT_FAILURE_RATE', '0.5'))
+    CIRCUIT_MIN_CALLS = int(os.getenv('CIRCUIT_MIN_CALLS', '10'))
+    CIRCUIT_WINDOW = float(os.getenv('CIRCUIT_WINDOW', '30'))
+    CIRCUIT_OPEN_SECONDS = float(os.getenv('CIRCUIT_OPEN_SECONDS', '15'))
+    CIRCUIT_PROBES = int(os.getenv('CIRCUIT_PROBES', '1'))
+
+    # Request/response log for replay and offline analysis (benchmarks/replay.py). It keeps
+    # request bodies, medical notes included, on local disk, so it is off unless enabled
+    TRAFFIC_LOG_ENABLED = os.getenv('TRAFFIC_LOG_ENABLED', 'false').lower() == 'true'
+    TRAFFIC_LOG_DIR = os.getenv('TRAFFIC_LOG_DIR', 'traffic_log')
+    TRAFFIC_LOG_FLUSH_INTERVAL = float(os.getenv('TRAFFIC_LOG_FLUSH_INTERVAL', '30'))
+    TRAFFIC_LOG_SEGMENT_ROWS = int(os.getenv('TRAFFIC_LOG_SEGMENT_ROWS', '1000'))
+    TRAFFIC_LOG_MAX_PENDING = int(os.getenv('TRAFFIC_LOG_MAX_PENDING', '10000'))
+    TRAFFIC_LOG_MAX_BYTES = int(os.getenv('TRAFFIC_LOG_MAX_BYTES', str(256 * 1024 * 1024)))
+    TRAFFIC_LOG_MAX_AGE = int(os.getenv('TRAFFIC_LOG_MAX_AGE', str(7 * 86400)))
@@ -0,0 +1,45 @@
+# gunicorn settings, overridable through the environment:
+#
+#     gunicorn -c gunicorn.conf.py wsgi:app
+#
+# Requests spend nearly all their time waiting on the Mistral API, so the
+# default gthread workers run many threads each; GUNICORN_WORKER_CLASS=gevent
+# switches to cooperative workers for very high concurrency (see async_server.py).
+import multiprocessing
+import os
+
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+if worker_class == 'gevent':
+    # With preload_app the app is imported here in the master, so patch before that
+    from gevent import monkey
+    monkey.patch_all()
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '5000')}"
+# Each worker has its own model scheduler, so upstream concurrency is up to
+# workers x SCHEDULER_MAX_LIMIT; see benchmarks/RESULTS.md for measured numbers
+workers = int(os.getenv('GUNICORN_WORKERS', str(min(2 * multiprocessing.cpu_count() + 1, 4))))
+# Jobs and chat sessions must be shared by every worker: a job poll or the next chat
+# turn can land on any of them, and a recycled worker takes in-memory stores with it.
+# This file is read before preload_app imports main, so the defaults apply there
+for store in ('JOB_STORE', 'CHAT_SESSION_STORE'):
+    os.environ.setdefault(store, 'sqlite')
+threads = int(os.getenv('GUNICORN_THREADS', '32'))
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', '1000'))
+
+# Import main once in the master so the Mistral client, prompt templates and
+# rate table are built before fork and shared copy-on-write
+preload_app = True
+
+# Model calls may take up to MISTRAL_TIMEOUT (120s) plus queueing
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '180'))
+# SIGTERM (e.g. Cloud Run scale-down) stops accepting and lets in-flight requests finish
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '5'))
+
+# Recycle workers now and then to bound memory growth; jitter avoids restarting all at once
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '10000'))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', '1000'))
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG') or None
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
@@ -0,0 +1,103 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+class Hedger:
+    """Sends a second identical call when the first is slower than recent calls usually are.
+
+    The hedge fires once the first call has run past the `quantile` of the last
+    `window` latencies for the same key, and the first answer to arrive wins.
+    Running calls cannot be cancelled, so the loser finishes in the background
+    and its answer is discarded. Each call earns `budget` hedge credits (capped at
+    `burst`) and a hedge spends one, keeping the extra upstream load to about
+    `budget` of all calls.
+    """
+
+    def __init__(self, quantile=0.95, budget=0.05, burst=10, window=200, min_samples=20,
+                 min_delay=0.05, max_workers=128):
+        self.quantile = quantile
+        self.budget = budget
+        self.burst = burst
+        self.window = window
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='hedge')
+        self._lock = threading.Lock()
+        self._latencies = {}
+        self._delays = {}
+        self._recorded = {}
+        self._credits = float(burst)
+        self._stats = {}
+
+    def delay(self, key):
+        # Seconds to wait before hedging, or None until enough latencies are known
+        with self._lock:
+            return self._delays.get(key)
+
+    def run(self, key, endpoint, fn):
+        delay = self.delay(key)
+        with self._lock:
+            stats = self._stats.setdefault(endpoint, {'calls': 0, 'hedged': 0, 'wins': 0, 'skipped': 0})
+            stats['calls'] += 1
+            self._credits = min(self.burst, self._credits + self.budget)
+        if delay is None:
+            return self._timed(key, fn)
+
+        primary = self._executor.submit(self._timed, key, fn)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+        with self._lock:
+            if self._credits < 1:
+                stats['skipped'] += 1
+                hedge = None
+            else:
+                self._credits -= 1
+                stats['hedged'] += 1
+                hedge = self._executor.submit(self._timed, key, fn)
+        if hedge is None:
+            return primary.result()
+
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        with self._lock:
+                            stats['wins'] += 1
+                    return future.result()
+        # Both failed: surface the original call's error
+        return primary.result()
+
+    def _timed(self, key, fn):
+        start = time.perf_counter()
+        result = fn()
+        self._record(key, time.perf_counter() - start)
+        return result
+
+    def _record(self, key, latency):
+        with self._lock:
+            samples = self._latencies.get(key)
+            if samples is None:
+                samples = self._latencies[key] = deque(maxlen=self.window)
+            samples.append(latency)
+            self._recorded[key] = self._recorded.get(key, 0) + 1
+            # No need to re-sort the window on every call; refresh every few samples
+            if len(samples) >= self.min_samples and (key not in self._delays or self._recorded[key] % 8 == 0):
+                ordered = sorted(samples)
+                index = min(len(ordered) - 1, int(self.quantile * len(ordered)))
+                self._delays[key] = max(self.min_delay, ordered[index])
+
+    def stats(self):
+        with self._lock:
+            return {
+                endpoint: dict(
+                    counts,
+                    hedge_rate=counts['hedged'] / counts['calls'] if counts['calls'] else 0.0,
+                    win_rate=counts['wins'] / counts['hedged'] if counts['hedged'] else 0.0,
+                )
+                for endpoint, counts in self._stats.items()
+            }
@@ -0,0 +1,187 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+FINISHED = (DONE, FAILED)
+
+
+class QueueFull(Exception):
+    pass
+
+
+class MemoryJobStore:
+    """Job records for this process, dropped once they expire or past max_entries."""
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job['expires_at'] and job['expires_at'] < time.time():
+                del self._jobs[job_id]
+                return None
+            return dict(job) if job is not None else None
+
+    def put(self, job):
+        with self._lock:
+            self._jobs[job['job_id']] = dict(job)
+            self._jobs.move_to_end(job['job_id'])
+            now = time.time()
+            for job_id in [key for key, value in self._jobs.items()
+                           if value['expires_at'] and value['expires_at'] < now]:
+                del self._jobs[job_id]
+            while len(self._jobs) > self.max_entries:
+                self._jobs.popitem(last=False)
+
+
+class SQLiteJobStore:
+    """Job records on local disk, readable by every worker process on the host."""
+
+    def __init__(self, path):
+        self.path = path
+        self._connect()
+        # Connections must not cross a fork (gunicorn preload_app); children reopen
+        os.register_at_fork(after_in_child=self._connect)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            'job_id TEXT PRIMARY KEY, record TEXT NOT NULL, expires_at REAL)'
+        )
+        self._conn.commit()
+
+    def _connect(self):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT record FROM jobs WHERE job_id = ? AND (expires_at IS NULL OR expires_at >= ?)',
+                (job_id, time.time())
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, job):
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO jobs VALUES (?, ?, ?)',
+                (job['job_id'], json.dumps(job), job['expires_at'])
+            )
+            self._conn.execute('DELETE FROM jobs WHERE expires_at < ?', (time.time(),))
+            self._conn.commit()
+
+
+class JobQueue:
+    """Runs long model calls on a worker pool and keeps their results for polling.
+
+    submit() returns right away; callers fetch the record with get(), optionally
+    waiting up to `wait` seconds for it to finish (long polling). A job not
+    finished `max_runtime` seconds after submission reads as failed: the worker
+    process running it may have died or been recycled, and nothing else will
+    finish it.
+    """
+
+    def __init__(self, store, workers=4, max_pending=1000, result_ttl=3600, max_runtime=900,
+                 poll_interval=0.5):
+        self.store = store
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self.max_runtime = max_runtime
+        self.poll_interval = poll_interval
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job')
+        self._lock = threading.Lock()
+        self._events = {}
+        self._running = 0
+
+    def submit(self, kind, fn, *args):
+        # fn returns a dict that is merged into the finished job record
+        with self._lock:
+            if len(self._events) >= self.max_pending:
+                raise QueueFull('Too many jobs pending, try again later')
+            job_id = uuid.uuid4().hex
+            self._events[job_id] = threading.Event()
+        now = time.time()
+        # Unfinished records expire too, so an orphaned job is eventually removed
+        job = {'job_id': job_id, 'kind': kind, 'state': QUEUED, 'created_at': now, 'updated_at': now,
+               'expires_at': now + self.max_runtime + self.result_ttl}
+        self.store.put(job)
+        accepted = dict(job)
+        self._executor.submit(self._run, job, fn, args)
+        return accepted
+
+    def get(self, job_id, wait=0):
+        job = self._load(job_id)
+        if job is None or job['state'] in FINISHED or wait <= 0:
+            return job
+        event = self._events.get(job_id)
+        if event is not None:
+            event.wait(wait)
+            return self._load(job_id)
+        # Submitted by another process sharing the store, so poll it
+        deadline = time.monotonic() + wait
+        while job is not None and job['state'] not in FINISHED and time.monotonic() < deadline:
+            time.sleep(min(self.poll_interval, max(deadline - time.monotonic(), 0)))
+            job = self._load(job_id)
+        return job
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._events)
+            return {'queued': pending - self._running, 'running': self._running}
+
+    def _load(self, job_id):
+        job = self.store.get(job_id)
+        if job is not None and job['state'] not in FINISHED and self._overdue(job):
+            job.update(state=FAILED, error=f'Job did not finish within {self.max_runtime} seconds')
+        return job
+
+    def _overdue(self, job):
+        return time.time() > job['created_at'] + self.max_runtime
+
+    def _run(self, job, fn, args):
+        with self._lock:
+            self._running += 1
+        try:
+            if self._overdue(job):
+                # Waited out its whole runtime in the queue; callers already see it as failed
+                self._update(job, state=FAILED, error=f'Job did not start within {self.max_runtime} seconds',
+                             expires_at=time.time() + self.result_ttl)
+                return
+            self._update(job, state=RUNNING)
+            try:
+                result = fn(*args)
+            except Exception as e:
+                self._update(job, state=FAILED, error=str(e),
+                             expires_at=time.time() + self.result_ttl)
+            else:
+                self._update(job, state=DONE, expires_at=time.time() + self.result_ttl, **result)
+        finally:
+            with self._lock:
+                self._running -= 1
+                event = self._events.pop(job['job_id'])
+            event.set()
+
+    def _update(self, job, **fields):
+        job.update(fields, updated_at=time.time())
+        self.store.put(job)
+
+
+def create_job_queue(config):
+    if config.JOB_STORE == 'sqlite':
+        store = SQLiteJobStore(config.JOB_STORE_PATH)
+    else:
+        store = MemoryJobStore()
+    return JobQueue(store, workers=config.JOB_WORKERS, max_pending=config.JOB_MAX_PENDING,
+                    result_ttl=config.JOB_RESULT_TTL, max_runtime=config.JOB_MAX_RUNTIME)
@@ -1,14 +1,368 @@
-from flask import Flask, request, jsonify
+import json
+import posixpath
+import time
+from contextlib import nullcontext
+
+import requests
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 from mistralai.client import MistralClient
+from mistralai.exceptions import MistralAPIException, MistralConnectionException, MistralException
 from mistralai.models.chat_completion import ChatMessage
 from config import Config
+from cache import create_cache
+from similarity import CategoryIndex
+from classifier import LocalClassifier
+from categories import CATEGORIES, match_category
+from batch import BatchRunner
+import medical_rules
+import rates
+from newsletter import split_chunks
+import metrics
+import traffic
+from prompts import PromptRegistry
+from singleflight import SingleFlight
+from scheduler import ModelScheduler, SchedulerTimeout
+from circuit import CircuitBreaker, CircuitOpen, is_upstream_failure
+from routing import ModelRouter
+from hedging import Hedger
+from jobs import QueueFull, create_job_queue
+from sessions import create_session_manager
 
 app = Flask(__name__)
 CORS(app)
+metrics.init_app(app)
+traffic_log = traffic.create_traffic_log(Config)
+if traffic_log is not None:
+    traffic.init_app(app, traffic_log)
+
+class StreamingMistralClient(MistralClient):
+    # mistralai 0.0.7 sends streamed requests without a timeout and never checks their
+    # status, so a failed call looks like an empty stream and a hung one never ends
+    def _request(self, method, json, path, stream=False, params=None):
+        if not stream:
+            return super()._request(method, json, path, stream=stream, params=params)
+        try:
+            response = requests.request(
+                method,
+                posixpath.join(self._endpoint, path),
+                headers={'Authorization': f'Bearer {self._api_key}', 'Content-Type': 'application/json'},
+                json=json,
+                stream=True,
+                timeout=self._timeout
+            )
+        except requests.exceptions.ConnectionError as e:
+            raise MistralConnectionException(str(e)) from e
+        except requests.exceptions.RequestException as e:
+            raise MistralException(f'Unexpected exception ({e.__class__.__name__}): {e}') from e
+        if response.status_code >= 400:
+            raise MistralAPIException.from_response(response)
+        return response
 
 # Initialize Mistral client
-mistral_client = MistralClient(api_key=Config.MISTRAL_API_KEY)
+mistral_client = StreamingMistralClient(
+    api_key=Config.MISTRAL_API_KEY,
+    endpoint=Config.MISTRAL_ENDPOINT,
+    max_retries=Config.MISTRAL_MAX_RETRIES,
+    timeout=Config.MISTRAL_TIMEOUT
+)
+prompt_registry = PromptRegistry(versions=Config.PROMPT_VERSIONS)
+response_cache = create_cache(Config)
+category_index = CategoryIndex(
+    threshold=Config.SEMANTIC_CACHE_THRESHOLD,
+    max_entries=Config.SEMANTIC_CACHE_MAX_ENTRIES
+)
+batch_runner = BatchRunner(
+    max_workers=Config.BATCH_CONCURRENCY,
+    max_items=Config.BATCH_MAX_ITEMS
+)
+chunk_runner = BatchRunner(max_workers=Config.NEWSLETTER_CHUNK_CONCURRENCY)
+job_queue = create_job_queue(Config)
+local_classifier = LocalClassifier(
+    Config.CLASSIFIER_MODEL_PATH,
+    Config.CLASSIFIER_LOG_PATH,
+    min_confidence=Config.CLASSIFIER_MIN_CONFIDENCE,
+    min_examples=Config.CLASSIFIER_MIN_EXAMPLES,
+    retrain_every=Config.CLASSIFIER_RETRAIN_EVERY,
+    max_examples=Config.CLASSIFIER_MAX_EXAMPLES,
+    labels=CATEGORIES
+)
+
+cache_hits = metrics.REGISTRY.gauge('response_cache_hits', 'Response cache hits', ('endpoint',))
+cache_misses = metrics.REGISTRY.gauge('response_cache_misses', 'Response cache misses', ('endpoint',))
+cache_stale_hits = metrics.REGISTRY.gauge(
+    'response_cache_stale_hits', 'Expired answers served because the model call failed', ('endpoint',))
+semantic_bypass_rate = metrics.REGISTRY.gauge(
+    'categorize_semantic_bypass_ratio', 'Share of /categorize lookups answered by the similarity index')
+classifier_rate = metrics.REGISTRY.gauge(
+    'categorize_classifier_ratio', 'Share of classifier predictions confident enough to skip the model')
+
+def collect_cache_stats():
+    for endpoint, counts in response_cache.stats()['endpoints'].items():
+        cache_hits.set(counts['hits'], endpoint=endpoint)
+        cache_misses.set(counts['misses'], endpoint=endpoint)
+        cache_stale_hits.set(counts['stale_hits'], endpoint=endpoint)
+    semantic_bypass_rate.set(category_index.stats()['bypass_rate'])
+    classifier_rate.set(local_classifier.stats()['confident_rate'])
+
+metrics.REGISTRY.add_collector(collect_cache_stats)
+
+in_flight = SingleFlight()
+hedger = Hedger(
+    quantile=Config.HEDGE_QUANTILE,
+    budget=Config.HEDGE_BUDGET,
+    min_samples=Config.HEDGE_MIN_SAMPLES
+)
+hedge_rate = metrics.REGISTRY.gauge(
+    'hedge_rate', 'Share of eligible model calls that sent a hedge', ('endpoint',))
+hedge_win_rate = metrics.REGISTRY.gauge(
+    'hedge_win_rate', 'Share of hedges that answered before the original call', ('endpoint',))
+hedge_calls = metrics.REGISTRY.gauge(
+    'hedge_calls', 'Hedging counters by kind', ('endpoint', 'kind'))
+
+def collect_hedge_stats():
+    for endpoint, stats in hedger.stats().items():
+        hedge_rate.set(stats['hedge_rate'], endpoint=endpoint)
+        hedge_win_rate.set(stats['win_rate'], endpoint=endpoint)
+        for kind in ('calls', 'hedged', 'wins', 'skipped'):
+            hedge_calls.set(stats[kind], endpoint=endpoint, kind=kind)
+
+metrics.REGISTRY.add_collector(collect_hedge_stats)
+model_router = ModelRouter(
+    Config.MODEL_TIERS,
+    routes=Config.MODEL_ROUTES,
+    default_model=Config.CHAT_MODEL,
+    escalate_chars=Config.MODEL_ESCALATE_CHARS
+)
+model_scheduler = ModelScheduler(
+    priorities=Config.SCHEDULER_PRIORITIES,
+    class_shares=Config.SCHEDULER_CLASS_SHARES,
+    initial_limit=Config.SCHEDULER_INITIAL_LIMIT,
+    min_limit=Config.SCHEDULER_MIN_LIMIT,
+    max_limit=Config.SCHEDULER_MAX_LIMIT,
+    rate=Config.UPSTREAM_RATE_LIMIT,
+    burst=Config.UPSTREAM_BURST,
+    queue_timeout=Config.SCHEDULER_QUEUE_TIMEOUT
+)
+scheduler_limit = metrics.REGISTRY.gauge(
+    'scheduler_concurrency_limit', 'Current adaptive limit on concurrent model calls')
+scheduler_in_flight = metrics.REGISTRY.gauge(
+    'scheduler_in_flight', 'Model calls currently holding a scheduler slot')
+scheduler_queued = metrics.REGISTRY.gauge(
+    'scheduler_queued', 'Model calls waiting for a slot', ('priority',))
+scheduler_throttled = metrics.REGISTRY.gauge(
+    'scheduler_throttled', 'Upstream 429 responses seen by the scheduler')
+scheduler_rejected = metrics.REGISTRY.gauge(
+    'scheduler_rejected', 'Model calls that timed out waiting for a slot')
+
+def collect_scheduler_stats():
+    stats = model_scheduler.stats()
+    scheduler_limit.set(stats['limit'])
+    scheduler_in_flight.set(stats['in_flight'])
+    for priority in set(Config.SCHEDULER_PRIORITIES.values()) | set(stats['queued']):
+        scheduler_queued.set(stats['queued'].get(priority, 0), priority=priority)
+    scheduler_throttled.set(stats['throttled'])
+    scheduler_rejected.set(stats['rejected'])
+
+metrics.REGISTRY.add_collector(collect_scheduler_stats)
+
+circuit_breaker = CircuitBreaker(
+    failure_rate=Config.CIRCUIT_FAILURE_RATE,
+    min_calls=Config.CIRCUIT_MIN_CALLS,
+    window=Config.CIRCUIT_WINDOW,
+    open_seconds=Config.CIRCUIT_OPEN_SECONDS,
+    probes=Config.CIRCUIT_PROBES,
+    # A full local queue is our overload, not an upstream failure
+    ignore=(SchedulerTimeout,)
+)
+circuit_state = metrics.REGISTRY.gauge(
+    'circuit_state', 'Model circuit breaker state (1 for the current one)', ('state',))
+circuit_opened = metrics.REGISTRY.gauge(
+    'circuit_opened', 'Times the model circuit breaker has opened')
+circuit_rejected = metrics.REGISTRY.gauge(
+    'circuit_rejected', 'Model calls failed fast by the circuit breaker')
+
+def collect_circuit_stats():
+    stats = circuit_breaker.stats()
+    for state in ('closed', 'open', 'half_open'):
+        circuit_state.set(1 if stats['state'] == state else 0, state=state)
+    circuit_opened.set(stats['opened'])
+    circuit_rejected.set(stats['rejected'])
+
+metrics.REGISTRY.add_collector(collect_circuit_stats)
+
+def upstream_call():
+    # Raises CircuitOpen right away while the model service is failing
+    return circuit_breaker.guard() if Config.CIRCUIT_ENABLED else nullcontext()
+
+jobs_submitted = metrics.REGISTRY.counter(
+    'jobs_submitted_total', 'Background jobs accepted', ('kind',))
+jobs_pending = metrics.REGISTRY.gauge(
+    'jobs_pending', 'Background jobs in this process by state', ('state',))
+
+def collect_job_stats():
+    for state, count in job_queue.stats().items():
+        jobs_pending.set(count, state=state)
+
+metrics.REGISTRY.add_collector(collect_job_stats)
+traffic_log_rows = metrics.REGISTRY.gauge(
+    'traffic_log_rows', 'Request log rows by state (pending, written, dropped)', ('state',))
+
+def collect_traffic_stats():
+    if traffic_log is not None:
+        stats = traffic_log.stats()
+        for state in ('pending', 'written', 'dropped'):
+            traffic_log_rows.set(stats[state], state=state)
+
+metrics.REGISTRY.add_collector(collect_traffic_stats)
+medical_validation_errors = metrics.REGISTRY.counter(
+    'medical_validation_errors_total', '/extract-medical fields still invalid after retries', ('field',))
+coalesced_requests = metrics.REGISTRY.counter(
+    'model_requests_coalesced_total', 'Requests answered by sharing an identical in-flight model call',
+    ('endpoint',))
+
+def route_model(endpoint, messages, model=None):
+    # An explicit model (e.g. an escalation) wins; otherwise the endpoint's route
+    if model is not None:
+        return model
+    model, reason = model_router.select(endpoint, messages)
+    if reason is not None:
+        metrics.model_escalations.inc(endpoint=endpoint, reason=reason)
+    return model
+
+def ask_model(endpoint, messages, model=None, options=None):
+    # Serve repeated prompts from the cache instead of paying another model round-trip
+    model = route_model(endpoint, messages, model)
+    with metrics.phase('cache', endpoint):
+        key = response_cache.make_key(endpoint, model, messages, options)
+        cached = response_cache.get(endpoint, key)
+    if cached is not None:
+        return cached
+
+    try:
+        if not Config.SINGLE_FLIGHT_ENABLED:
+            return call_model(endpoint, model, messages, key, options)
+
+        # Identical requests already waiting on the model share that call's answer
+        content, shared = in_flight.do(key, lambda: call_model(endpoint, model, messages, key, options))
+    except Exception as e:
+        # While the model is failing, an expired answer beats an error
+        stale = response_cache.get_stale(endpoint, key) if is_upstream_failure(e) else None
+        if stale is None:
+            raise
+        return stale
+    if shared:
+        coalesced_requests.inc(endpoint=endpoint)
+    return content
+
+def call_model(endpoint, model, messages, key, options=None):
+    # options are extra chat() arguments such as max_tokens or temperature
+    send = lambda: request_model(endpoint, model, messages, options)
+    if Config.HEDGE_ENABLED and endpoint in Config.HEDGE_ENDPOINTS:
+        response = hedger.run((endpoint, model), endpoint, traffic.bind(send))
+    else:
+        response = send()
+    content = response.choices[0].message.content
+    response_cache.set(endpoint, key, content)
+    return content
+
+def request_model(endpoint, model, messages, options=None):
+    # One upstream call; a hedged request may run two of these at once
+    queued = time.perf_counter()
+    with upstream_call(), model_scheduler.slot(endpoint):
+        metrics.observe_phase('queue', endpoint, queued)
+        start = time.perf_counter()
+        with metrics.phase('model', endpoint):
+            try:
+                response = mistral_client.chat(
+                    model=model,
+                    messages=messages,
+                    **(options or {})
+                )
+            except Exception:
+                metrics.model_requests.inc(endpoint=endpoint, model=model, outcome='error')
+                raise
+        metrics.model_latency.observe(time.perf_counter() - start, endpoint=endpoint, model=model)
+    metrics.model_requests.inc(endpoint=endpoint, model=model, outcome='success')
+    metrics.record_usage(endpoint, model, response.usage, Config.MODEL_PRICES)
+    traffic.note_usage(model, response.usage)
+    return response
+
+def stream_model(endpoint, messages, model=None):
+    # Same cache as ask_model, but yields tokens as soon as the model produces them
+    model = route_model(endpoint, messages, model)
+    with metrics.phase('cache', endpoint):
+        key = response_cache.make_key(endpoint, model, messages)
+        cached = response_cache.get(endpoint, key)
+    if cached is not None:
+        yield cached
+        return
+
+    parts = []
+    usage = None
+    queued = time.perf_counter()
+    try:
+        with upstream_call(), model_scheduler.slot(endpoint):
+            metrics.observe_phase('queue', endpoint, queued)
+            start = time.perf_counter()
+            try:
+                for chunk in mistral_client.chat_stream(model=model, messages=messages):
+                    metrics.record_usage(endpoint, model, chunk.usage, Config.MODEL_PRICES)
+                    usage = chunk.usage or usage
+                    token = chunk.choices[0].delta.content if chunk.choices else None
+                    if token:
+                        if not parts:
+                            metrics.observe_phase('first_token', endpoint, start)
+                        parts.append(token)
+                        yield token
+                if not parts:
+                    # An upstream error can still end the stream early; it is never an answer
+                    raise MistralException('Model stream ended without a response')
+            except Exception:
+                metrics.model_requests.inc(endpoint=endpoint, model=model, outcome='error')
+                raise
+            metrics.observe_phase('model', endpoint, start)
+            metrics.model_latency.observe(time.perf_counter() - start, endpoint=endpoint, model=model)
+    except Exception as e:
+        # Nothing sent yet, so a stale answer can still replace the stream
+        stale = response_cache.get_stale(endpoint, key) if not parts and is_upstream_failure(e) else None
+        if stale is None:
+            raise
+        yield stale
+        return
+    metrics.model_requests.inc(endpoint=endpoint, model=model, outcome='success')
+    traffic.note_usage(model, usage)
+    response_cache.set(endpoint, key, ''.join(parts))
+
+def sse_event(payload):
+    return f'data: {json.dumps(payload)}\n\n'
+
+def stale_flag(*responses):
+    # Answers served from the cache after the model call failed are marked stale
+    return {'stale': True} if any(getattr(response, 'stale', False) for response in responses) else {}
+
+def model_unavailable(e):
+    return jsonify({'error': str(e), 'status': 'error'}), 503, {'Retry-After': str(max(1, round(e.retry_after)))}
+
+def stream_response(endpoint, messages, tokens=None, on_complete=None, **extra):
+    # Server-Sent Events: one {"token"} event per chunk, then the usual JSON body.
+    # tokens replaces the model stream for answers produced locally
+    def events():
+        parts = []
+        try:
+            for token in tokens if tokens is not None else stream_model(endpoint, messages):
+                parts.append(token)
+                yield sse_event({'token': token})
+            if on_complete is not None:
+                on_complete(''.join(parts))
+            yield sse_event({'response': ''.join(parts), 'status': 'success', **extra, **stale_flag(*parts)})
+        except Exception as e:
+            yield sse_event({'error': str(e), 'status': 'error'})
+
+    return Response(events(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
 
 @app.route('/chat', methods=['POST'])
 def chat():
@@ -19,35 +373,221 @@ def chat():
         if not user_message:
             return jsonify({'error': 'No message provided'}), 400
 
-        # Create system message for customer support context
-        system_message = """You are a helpful customer support assistant. 
-        Provide clear, concise, and friendly responses to customer inquiries. 
-        If you're unsure about something, be honest and suggest escalating to a human agent."""
+        # Pass a session_id (or "session": true to start one) to keep server-side history
+        session_id = data.get('session_id') or (session_manager.new_id() if data.get('session') else None)
+        with metrics.phase('prompt', 'chat'):
+            if session_id:
+                messages = chat_messages(session_manager.load(session_id), user_message)
+            else:
+                messages = prompt_registry.get('chat').messages(user_message)
 
-        # Create chat messages
-        messages = [
-            ChatMessage(role="system", content=system_message),
-            ChatMessage(role="user", content=user_message)
-        ]
+        extra = {'session_id': session_id} if session_id else {}
+        on_complete = (lambda response: session_manager.append(session_id, user_message, response)) if session_id else None
 
         # Get response from Mistral AI
-        response = mistral_client.chat(
-            model=Config.CHAT_MODEL,
-            messages=messages
-        )
+        if data.get('stream'):
+            return stream_response('chat', messages, on_complete=on_complete, **extra)
+
+        response = ask_model('chat', messages)
+        if on_complete is not None:
+            on_complete(response)
 
         # Access the response content correctly
         return jsonify({
-            'response': response.choices[0].message.content,
-            'status': 'success'
+            'response': response,
+            'status': 'success',
+            **extra,
+            **stale_flag(response)
         })
 
+    except CircuitOpen as e:
+        return model_unavailable(e)
     except Exception as e:
         return jsonify({
             'error': str(e),
             'status': 'error'
         }), 500
 
+def chat_messages(session, user_message):
+    # System prefix (plus the summary of compacted turns), recent history, then the new message
+    template = prompt_registry.get('chat')
+    system = template.system_message
+    if session['summary']:
+        system = ChatMessage(role='system', content=f"{template.system}\n\n"
+                                                   f"Summary of the earlier conversation:\n{session['summary']}")
+    history = [ChatMessage(role=role, content=content) for role, content in session['turns']]
+    return [system] + history + template.messages(user_message)[1:]
+
+def summarize_history(summary, turns):
+    transcript = '\n'.join(f'{role.capitalize()}: {content}' for role, content in turns)
+    notes = f'# Notes so far\n{summary}\n\n# Latest exchanges\n{transcript}' if summary else transcript
+    return ask_model('chat-summary', prompt_registry.get('chat-summary').messages(notes))
+
+session_manager = create_session_manager(Config, summarize_history)
+chat_compactions = metrics.REGISTRY.gauge(
+    'chat_session_compactions', 'Chat histories folded into a summary')
+chat_sessions = metrics.REGISTRY.gauge(
+    'chat_sessions', 'Chat sessions held in the session store')
+
+def collect_session_stats():
+    stats = session_manager.stats()
+    chat_sessions.set(stats['sessions'])
+    chat_compactions.set(stats['compactions'])
+
+metrics.REGISTRY.add_collector(collect_session_stats)
+
+def categorize_text(query, threshold=None):
+    # Paraphrases of a query we have already labelled get the same category
+    if Config.SEMANTIC_CACHE_ENABLED:
+        match = category_index.lookup(query, threshold=threshold)
+        if match is not None:
+            return {
+                'response': match.category,
+                'category': match.category,
+                'status': 'success',
+                'source': 'semantic-cache',
+                'similarity': round(match.score, 4)
+            }
+
+    if Config.CLASSIFIER_ENABLED:
+        with metrics.phase('classifier', 'categorize'):
+            prediction = local_classifier.predict(query)
+        if prediction is not None:
+            return {
+                'response': prediction[0],
+                'category': prediction[0],
+                'status': 'success',
+                'source': 'classifier',
+                'confidence': round(prediction[1], 4)
+            }
+
+    with metrics.phase('prompt', 'categorize'):
+        messages = prompt_registry.get('categorize').messages(query)
+    # A label is a few tokens; the cap stops the model from explaining itself
+    options = {'max_tokens': Config.CATEGORIZE_MAX_TOKENS, 'temperature': 0.0}
+    model = route_model('categorize', messages)
+    response = ask_model('categorize', messages, model=model, options=options)
+    category = match_category(response)
+    larger = model_router.escalate(model) if category is None else None
+    if larger is not None:
+        # The small model answered with no recognizable label; ask the next tier once
+        metrics.model_escalations.inc(endpoint='categorize', reason='validation')
+        response = ask_model('categorize', messages, model=larger, options=options)
+        category = match_category(response)
+    if category is not None:
+        if Config.SEMANTIC_CACHE_ENABLED:
+            category_index.add(query, category)
+        if Config.CLASSIFIER_ENABLED:
+            local_classifier.record(query, category)
+
+    result = {
+        'response': category or 'Other',
+        'category': category or 'Other',
+        'status': 'success'
+    }
+    if category is None:
+        # Keep the unparseable answer so it can be inspected
+        result['model_response'] = response
+    result.update(stale_flag(response))
+    return result
+
+def summarize_chunks(chunks):
+    # Map step: chunk summaries run concurrently and are cached on the chunk text
+    template = prompt_registry.get('newsletter-chunk')
+    results = chunk_runner.run(chunks, traffic.bind(lambda chunk: {
+        'response': ask_model('newsletter-chunk', template.messages(chunk)),
+        'status': 'success'
+    }))
+    for result in results:
+        if result['status'] == 'error':
+            raise RuntimeError(f"Summarizing a newsletter section failed: {result['error']}")
+    return [result['response'] for result in results]
+
+def newsletter_messages(newsletter, max_rounds=3):
+    if len(newsletter) <= Config.NEWSLETTER_SINGLE_PASS_CHARS:
+        with metrics.phase('prompt', 'analyze-newsletter'):
+            return prompt_registry.get('analyze-newsletter').messages(newsletter)
+
+    notes = newsletter
+    for _ in range(max_rounds):
+        chunks = split_chunks(notes, max_chars=Config.NEWSLETTER_CHUNK_CHARS,
+                              min_chars=Config.NEWSLETTER_CHUNK_CHARS // 4)
+        if len(chunks) == 1:
+            break
+        notes = '\n\n'.join(summarize_chunks(chunks))
+        # Very long inputs can need another pass before the notes fit in one prompt
+        if len(notes) <= Config.NEWSLETTER_SINGLE_PASS_CHARS:
+            break
+    with metrics.phase('prompt', 'analyze-newsletter'):
+        return prompt_registry.get('newsletter-reduce').messages(notes)
+
+def extract_medical_fields(medical_notes):
+    # Templated notes resolve locally; only the fields the rules miss go to the model
+    fields = medical_rules.extract(medical_notes) if Config.MEDICAL_RULES_ENABLED else {}
+    sources = {name: 'rules' for name in fields}
+    pending = [name for name in medical_rules.MEDICAL_SCHEMA if name not in fields]
+    errors = {}
+    attempts = 0
+    responses = []
+    result = {'status': 'success'}
+
+    if pending:
+        with metrics.phase('prompt', 'extract-medical'):
+            template = prompt_registry.get('extract-medical', schema=medical_rules.schema_text(tuple(pending)))
+            messages = template.messages(medical_notes)
+        model = route_model('extract-medical', messages)
+        while attempts <= Config.MEDICAL_MAX_RETRIES:
+            if attempts:
+                # Retries go to the next tier up when there is one
+                larger = model_router.escalate(model)
+                if larger is not None:
+                    metrics.model_escalations.inc(endpoint='extract-medical', reason='validation')
+                    model = larger
+            response = ask_model('extract-medical', messages, model=model, options={'temperature': 0.0})
+            responses.append(response)
+            attempts += 1
+            extracted = medical_rules.parse_model_json(response)
+            with metrics.phase('validate', 'extract-medical'):
+                values, errors = medical_rules.validate(extracted, pending)
+            for name, value in values.items():
+                fields[name] = value
+                if value is not None:
+                    sources[name] = 'model'
+            if extracted is None:
+                result['model_response'] = response
+            else:
+                result.pop('model_response', None)
+            if not errors:
+                break
+            # Re-ask for the failed fields only, showing the model its previous answer
+            pending = list(errors)
+            messages = messages + [
+                ChatMessage(role='assistant', content=response),
+                ChatMessage(role='user', content=medical_rules.retry_instructions(errors))
+            ]
+        for name in errors:
+            medical_validation_errors.inc(field=name)
+
+    fields = {name: fields.get(name) for name in medical_rules.MEDICAL_SCHEMA}
+    result.update({
+        'response': json.dumps(fields),
+        'fields': fields,
+        'sources': sources,
+        'validation': {
+            'status': 'invalid' if errors else 'valid',
+            'errors': errors,
+            'attempts': attempts
+        }
+    })
+    result.update(stale_flag(*responses))
+    return result
+
+def read_threshold(data):
+    threshold = data.get('similarity_threshold')
+    if threshold is not None and not isinstance(threshold, (int, float)):
+        raise ValueError('similarity_threshold must be a number')
+    return threshold
+
 @app.route('/categorize', methods=['POST'])
 def categorize_query():
     try:
@@ -57,32 +597,39 @@ def categorize_query():
         if not query:
             return jsonify({'error': 'No query provided'}), 400
 
-        prompt = f"""
-        You are an AI assistant trained to support a bank's customer service team. Your task is to categorize customer inquiries into one of the 
-        following predefined categories:
+        try:
+            threshold = read_threshold(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
 
-        Account Management: Questions related to opening, closing, or managing bank accounts.
-        Transaction Issues: Inquiries about unauthorized charges, failed transactions, or disputes.
-        Loan Services: Requests for information on personal, home, or auto loans.
-        Credit Cards: Queries about credit card applications, benefits, or billing.
-        Online Banking: Issues related to internet banking, mobile app access, or technical support.
-        Fraud and Security: Reports of suspicious activity or questions about account security.
-        General Information: Requests for branch locations, operating hours, or bank policies.
+        return jsonify(categorize_text(query, threshold))
 
-        Given the customer inquiry below, determine the most appropriate category from the list above. If the inquiry doesn't fit any category, 
-        classify it as 'Other'
+    except CircuitOpen as e:
+        return model_unavailable(e)
+    except Exception as e:
+        return jsonify({
+            'error': str(e),
+            'status': 'error'
+        }), 500
+
+@app.route('/categorize/batch', methods=['POST'])
+def categorize_batch():
+    try:
+        data = request.json
+        queries = data.get('queries')
 
-        Query: {query}
-        """
+        error = batch_runner.validate(queries, 'queries')
+        if error:
+            return jsonify({'error': error}), 400
 
-        messages = [ChatMessage(role="user", content=prompt)]
-        response = mistral_client.chat(
-            model=Config.CHAT_MODEL,
-            messages=messages
-        )
+        try:
+            threshold = read_threshold(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
 
+        results = batch_runner.run(queries, traffic.bind(lambda query: categorize_text(query, threshold)))
         return jsonify({
-            'response': response.choices[0].message.content,
+            'results': results,
             'status': 'success'
         })
 
@@ -101,40 +648,29 @@ def extract_medical_info():
         if not medical_notes:
             return jsonify({'error': 'No medical notes provided'}), 400
 
-        prompt = f"""
-        Extract information from the following medical notes:
-        {medical_notes}
-        Return json format with the following JSON schema:
-        {{
-        "age": {{
-        "type": "integer"
-        }},
-        "gender": {{
-        "type": "string",
-        "enum": ["male", "female", "other"]
-        }},
-        "diagnosis": {{
-        "type": "string",
-        "enum": ["migraine", "diabetes", "arthritis", "acne"]
-        }},
-        "weight": {{
-        "type": "integer"
-        }},
-        "smoking": {{
-        "type": "string",
-        "enum": ["yes", "no"]
-        }}
-        }}
-        """
-
-        messages = [ChatMessage(role="user", content=prompt)]
-        response = mistral_client.chat(
-            model=Config.CHAT_MODEL,
-            messages=messages
-        )
+        return jsonify(extract_medical_fields(medical_notes))
 
+    except CircuitOpen as e:
+        return model_unavailable(e)
+    except Exception as e:
         return jsonify({
-            'response': response.choices[0].message.content,
+            'error': str(e),
+            'status': 'error'
+        }), 500
+
+@app.route('/extract-medical/batch', methods=['POST'])
+def extract_medical_batch():
+    try:
+        data = request.json
+        medical_notes = data.get('medical_notes')
+
+        error = batch_runner.validate(medical_notes, 'medical_notes')
+        if error:
+            return jsonify({'error': error}), 400
+
+        results = batch_runner.run(medical_notes, traffic.bind(extract_medical_fields))
+        return jsonify({
+            'results': results,
             'status': 'success'
         })
 
@@ -153,46 +689,45 @@ def mortgage_response():
         if not email:
             return jsonify({'error': 'No email provided'}), 400
 
-        prompt = f"""
-        You are a mortgage lender customer service bot, and your task is to
-        create personalized email responses to address customer questions.
-        Answer the customer's inquiry using the provided facts below. Ensure
-        that your response is clear, concise, and directly addresses the
-        customer's question. Address the customer in a friendly and
-        professional manner. Sign the email with "Lender Customer Support."
-
-        # Facts
-        30-year fixed-rate: interest rate 6.403%, APR 6.484%
-        20-year fixed-rate: interest rate 6.329%, APR 6.429%
-        15-year fixed-rate: interest rate 5.705%, APR 5.848%
-        10-year fixed-rate: interest rate 5.500%, APR 5.720%
-        7-year ARM: interest rate 7.011%, APR 7.660%
-        5-year ARM: interest rate 6.880%, APR 7.754%
-        3-year ARM: interest rate 6.125%, APR 7.204%
-        30-year fixed-rate FHA: interest rate 5.527%, APR 6.316%
-        30-year fixed-rate VA: interest rate 5.684%, APR 6.062%
-
-        # Email
-        {email}
-        """
-
-        messages = [ChatMessage(role="user", content=prompt)]
-        response = mistral_client.chat(
-            model=Config.CHAT_MODEL,
-            messages=messages
-        )
+        if Config.MORTGAGE_DIRECT_ANSWERS:
+            with metrics.phase('rates', 'mortgage-response'):
+                answer = rates.direct_answer(email)
+            if answer is not None:
+                if data.get('stream'):
+                    return stream_response('mortgage-response', None, tokens=[answer], source='rates')
+                return jsonify({
+                    'response': answer,
+                    'status': 'success',
+                    'source': 'rates'
+                })
+
+        with metrics.phase('prompt', 'mortgage-response'):
+            messages = prompt_registry.get('mortgage-response').messages(rates.prompt_input(email))
+        if data.get('stream'):
+            return stream_response('mortgage-response', messages)
+
+        response = ask_model('mortgage-response', messages)
 
         return jsonify({
-            'response': response.choices[0].message.content,
-            'status': 'success'
+            'response': response,
+            'status': 'success',
+            **stale_flag(response)
         })
 
+    except CircuitOpen as e:
+        return model_unavailable(e)
     except Exception as e:
         return jsonify({
             'error': str(e),
             'status': 'error'
         }), 500
 
+@app.route('/rates', methods=['GET'])
+def mortgage_rates():
+    return jsonify({'rates': rates.as_dicts(), 'status': 'success'}), 200, {
+        'Cache-Control': 'public, max-age=300'
+    }
+
 @app.route('/analyze-newsletter', methods=['POST'])
 def analyze_newsletter():
     try:
@@ -202,43 +737,58 @@ def analyze_newsletter():
         if not newsletter:
             return jsonify({'error': 'No newsletter provided'}), 400
 
-        prompt = f"""
-        You are a commentator. Your task is to write a report on a newsletter.
-        When presented with the newsletter, come up with interesting questions to ask,
-        and answer each question.
-        Afterward, combine all the information and write a report in the markdown
-        format.
-
-        # Newsletter:
-        {newsletter}
-
-        # Instructions:
-        ## Summarize:
-        In clear and concise language, summarize the key points and themes
-        presented in the newsletter.
-        ## Interesting Questions:
-        Generate three distinct and thought-provoking questions that can be
-        asked about the content of the newsletter. For each question:
-        - After "Q: ", describe the problem
-        - After "A: ", provide a detailed explanation of the problem addressed
-        in the question.
-        - Enclose the ultimate answer in <>.
-        ## Write a analysis report
-        Using the summary and the answers to the interesting questions,
-        create a comprehensive report in Markdown format.
-        """
-
-        messages = [ChatMessage(role="user", content=prompt)]
-        response = mistral_client.chat(
-            model=Config.CHAT_MODEL,
-            messages=messages
-        )
+        if data.get('job'):
+            # Answer right away; the client polls /jobs/<job_id> for the report
+            try:
+                job = job_queue.submit('analyze-newsletter', analyze_newsletter_job, newsletter)
+            except QueueFull as e:
+                return jsonify({'error': str(e), 'status': 'error'}), 503, {'Retry-After': '5'}
+            jobs_submitted.inc(kind='analyze-newsletter')
+            status_url = f"/jobs/{job['job_id']}"
+            return jsonify({
+                'job_id': job['job_id'],
+                'state': job['state'],
+                'status_url': status_url,
+                'status': 'success'
+            }), 202, {'Location': status_url}
+
+        messages = newsletter_messages(newsletter)
+        if data.get('stream'):
+            return stream_response('analyze-newsletter', messages)
+
+        response = ask_model('analyze-newsletter', messages)
 
         return jsonify({
-            'response': response.choices[0].message.content,
-            'status': 'success'
+            'response': response,
+            'status': 'success',
+            **stale_flag(response)
         })
 
+    except CircuitOpen as e:
+        return model_unavailable(e)
+    except Exception as e:
+        return jsonify({
+            'error': str(e),
+            'status': 'error'
+        }), 500
+
+def analyze_newsletter_job(newsletter):
+    response = ask_model('analyze-newsletter', newsletter_messages(newsletter))
+    return {'response': response, **stale_flag(response)}
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    try:
+        # ?wait=N holds the request up to N seconds for the job to finish
+        wait = min(max(request.args.get('wait', 0, type=float), 0), Config.JOB_MAX_WAIT)
+        job = job_queue.get(job_id, wait=wait)
+        if job is None:
+            return jsonify({'error': 'Unknown or expired job', 'status': 'error'}), 404
+
+        job.pop('expires_at', None)
+        job['status'] = 'error' if job['state'] == 'failed' else 'success'
+        return jsonify(job), 200
+
     except Exception as e:
         return jsonify({
             'error': str(e),
@@ -247,7 +797,21 @@ def analyze_newsletter():
 
 @app.route('/health', methods=['GET'])
 def health_check():
-    return jsonify({'status': 'healthy'}), 200
+    # The app stays healthy while the model circuit is open; stale answers are still served
+    return jsonify({'status': 'healthy', 'model_circuit': circuit_breaker.state}), 200
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify(response_cache.stats()), 200
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    return Response(metrics.REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/categorize/stats', methods=['GET'])
+def categorize_stats():
+    return jsonify({**category_index.stats(), 'classifier': local_classifier.stats()}), 200
 
 if __name__ == '__main__':
-    app.run(debug=True) 
\ No newline at end of file
+    # Development server only; production runs gunicorn -c gunicorn.conf.py wsgi:app
+    app.run(port=Config.PORT, debug=Config.DEBUG) 
\ No newline at end of file
@@ -0,0 +1,255 @@
+import json
+import re
+from functools import lru_cache
+
+# The schema the /extract-medical prompt asks the model to fill
+MEDICAL_SCHEMA = {
+    "age": {"type": "integer"},
+    "gender": {"type": "string", "enum": ["male", "female", "other"]},
+    "diagnosis": {"type": "string", "enum": ["migraine", "diabetes", "arthritis", "acne"]},
+    "weight": {"type": "integer"},
+    "smoking": {"type": "string", "enum": ["yes", "no"]},
+}
+
+# Other people a note may mention; their ages and conditions are not the patient's
+_RELATIVE = (r'(?:son|daughter|child|children|kid|baby|infant|brother|sister|sibling|mother|father|'
+             r'mom|dad|parent|wife|husband|spouse|partner|grand\w+|aunt|uncle|cousin|nephew|niece|friend)')
+_RELATIVE_BEFORE = re.compile(rf'\b{_RELATIVE}s?\b[^.;]{{0,15}}$', re.I)
+_RELATIVE_AFTER = re.compile(rf'^[\s-]*(?:\w+\s+)?{_RELATIVE}s?\b', re.I)
+
+_AGE = [
+    re.compile(r'\b(\d{1,3})[\s-]*(?:years?|yrs?)[\s-]*old\b', re.I),
+    re.compile(r'\b(?:age|aged)[\s:]*(\d{1,3})\b', re.I),
+    re.compile(r'\b(\d{1,3})\s*(?:y/o|yo)\b', re.I),
+]
+_WEIGHT = re.compile(r'\b(\d{2,3}(?:\.\d+)?)\s*(lbs?|pounds?|kgs?|kilograms?)\b', re.I)
+# In notes a weight counts only when stated as one, so "weight loss of 15 lbs" does not
+_WEIGHT_STATED = re.compile(
+    r'\b(?:weigh(?:s|ed|ing)?|weight(?:\s+(?:is|was|of)|\s*:))\s*(?:is\s+|about\s+|approximately\s+|around\s+)?'
+    r'(\d{2,3}(?:\.\d+)?)\s*(lbs?|pounds?|kgs?|kilograms?)\b', re.I)
+
+_GENDER_WORDS = {
+    'male': re.compile(r'\b(?:male|man|gentleman|boy)\b', re.I),
+    'female': re.compile(r'\b(?:female|woman|lady|girl)\b', re.I),
+}
+_GENDER_TITLES = {
+    'male': re.compile(r'\bmr\b\.?', re.I),
+    'female': re.compile(r'\b(?:mrs|ms|miss)\b\.?', re.I),
+}
+
+_DIAGNOSES = {
+    'migraine': re.compile(r'\bmigraines?\b', re.I),
+    'diabetes': re.compile(r'\bdiabet(?:es|ic)\b', re.I),
+    'arthritis': re.compile(r'\barthrit(?:is|ic)\b', re.I),
+    'acne': re.compile(r'\bacne\b', re.I),
+}
+_DIAGNOSED = re.compile(r'\bdiagnos(?:ed|is)\b[^.]{0,40}?\b(migraines?|diabet(?:es|ic)|arthrit(?:is|ic)|acne)\b', re.I)
+_FAMILY_HISTORY = re.compile(
+    rf'\b(?:{_RELATIVE}s?|family (?:history|hx))\b[^.;]{{0,40}}$', re.I)
+_NEGATED = re.compile(r'\b(?:no|denies|without|negative for|ruled out)\b[^.]{0,30}?$', re.I)
+
+_NON_SMOKER = re.compile(
+    r"\b(?:non-?smoker|never smoked|does not smoke|doesn't smoke|do not smoke|"
+    r"not an? (?:current )?smoker|denies (?:smoking|tobacco)|no (?:history of )?(?:smoking|tobacco))\b", re.I)
+_FORMER_SMOKER = re.compile(r'\b(?:former|ex-?|quit|stopped|previous)\s*(?:smok\w*)', re.I)
+_SMOKER = re.compile(r'\b(?:smoker|smokes|smoking|cigarettes?|pack[- ]years?)\b', re.I)
+# A negation carried across a list of substances: "denies alcohol, drug use, or smoking"
+_SMOKING_NEGATED = re.compile(
+    r'\b(?:no|denies|denied|without|negative for)\b'
+    r'(?:[\s,]+(?:or|and|nor)?\s*(?:alcohol|etoh|drugs?|drug use|illicit drugs?|recreational drugs?|'
+    r'substance use|caffeine))*[\s,]*(?:or|and|nor)?\s*$', re.I)
+
+
+def _extract_age(notes):
+    # Skips ages attached to someone else ("her 5-year-old son", "father, aged 70")
+    ages = set()
+    for pattern in _AGE:
+        for match in pattern.finditer(notes):
+            if (_RELATIVE_AFTER.search(notes[match.end():]) or _RELATIVE_BEFORE.search(notes[:match.start()])
+                    or not 0 < int(match.group(1)) < 130):
+                continue
+            ages.add(int(match.group(1)))
+    return ages.pop() if len(ages) == 1 else None
+
+
+def _pounds(value, unit):
+    value = float(value)
+    if unit.lower().startswith('k'):
+        value *= 2.20462
+    return int(round(value))
+
+
+def _extract_weight(notes):
+    weights = {_pounds(value, unit) for value, unit in _WEIGHT_STATED.findall(notes)}
+    return weights.pop() if len(weights) == 1 else None
+
+
+def _weight_value(text):
+    # A model's answer such as "210 lbs" or "95 kg" is only the value, so no context is needed
+    matches = _WEIGHT.findall(text)
+    return _pounds(*matches[0]) if len(matches) == 1 else None
+
+
+def _extract_gender(notes):
+    # Pronouns are not used: "her" may well be about someone else in the note
+    for patterns in (_GENDER_WORDS, _GENDER_TITLES):
+        found = [gender for gender, pattern in patterns.items() if pattern.search(notes)]
+        if len(found) == 1:
+            return found[0]
+        if found:
+            return None
+    return None
+
+
+def _extract_diagnosis(notes):
+    # Conditions in the family history ("Mother has diabetes") are not the patient's
+    diagnosed = {m.group(1).lower() for m in _DIAGNOSED.finditer(notes)
+                 if not _FAMILY_HISTORY.search(notes[:m.start()])}
+    if diagnosed:
+        found = [name for name, pattern in _DIAGNOSES.items()
+                 if any(pattern.search(term) for term in diagnosed)]
+    else:
+        found = [name for name, pattern in _DIAGNOSES.items()
+                 if any(not _NEGATED.search(notes[:m.start()]) and not _FAMILY_HISTORY.search(notes[:m.start()])
+                        for m in pattern.finditer(notes))]
+    return found[0] if len(found) == 1 else None
+
+
+def _extract_smoking(notes):
+    if _FORMER_SMOKER.search(notes):
+        return None
+    denied = [m.span() for m in _NON_SMOKER.finditer(notes)]
+    stated = False
+    for match in _SMOKER.finditer(notes):
+        if any(start <= match.start() < end for start, end in denied):
+            continue
+        if _SMOKING_NEGATED.search(notes[:match.start()]):
+            denied.append(match.span())
+        else:
+            stated = True
+    if stated and denied:
+        return None
+    if denied:
+        return 'no'
+    return 'yes' if stated else None
+
+
+_EXTRACTORS = {
+    'age': _extract_age,
+    'gender': _extract_gender,
+    'diagnosis': _extract_diagnosis,
+    'weight': _extract_weight,
+    'smoking': _extract_smoking,
+}
+
+
+def extract(notes):
+    # Returns only the fields the rules can resolve unambiguously; the rest are
+    # left for the model
+    fields = {}
+    for name, extractor in _EXTRACTORS.items():
+        value = extractor(notes)
+        if value is not None:
+            fields[name] = value
+    return fields
+
+
+# Repairs for model answers that carry the value inside text
+_REPAIRS = dict(_EXTRACTORS, weight=_weight_value)
+
+# Plausible ranges and shorthand answers accepted when validating model output
+_RANGES = {'age': (0, 130), 'weight': (1, 1500)}
+_ENUM_ALIASES = {
+    'gender': {'m': 'male', 'f': 'female', 'man': 'male', 'woman': 'female'},
+    'smoking': {'y': 'yes', 'n': 'no', 'true': 'yes', 'false': 'no', 'smoker': 'yes', 'non-smoker': 'no'},
+}
+
+
+def _compile_validator(name, spec):
+    # Builds a function that returns the value coerced to the schema type, repairing
+    # strings like "210 lbs" or "Male" with the rule extractors, or raises ValueError
+    repair = _REPAIRS.get(name)
+    if spec['type'] == 'integer':
+        low, high = _RANGES.get(name, (None, None))
+
+        def validate(value):
+            if isinstance(value, float) and value.is_integer():
+                value = int(value)
+            elif isinstance(value, str):
+                text = value.strip()
+                value = int(text) if text.isdigit() else repair(text) if repair else None
+                if value is None:
+                    raise ValueError('expected an integer')
+            if isinstance(value, bool) or not isinstance(value, int):
+                raise ValueError('expected an integer')
+            if low is not None and not low <= value <= high:
+                raise ValueError(f'{value} is outside {low}-{high}')
+            return value
+        return validate
+
+    enum = tuple(spec.get('enum', ()))
+    aliases = _ENUM_ALIASES.get(name, {})
+
+    def validate(value):
+        if isinstance(value, bool):
+            value = str(value)
+        if not isinstance(value, str):
+            raise ValueError('expected a string')
+        text = value.strip().lower()
+        text = aliases.get(text, text)
+        if not enum or text in enum:
+            return text
+        repaired = repair(value) if repair else None
+        if repaired in enum:
+            return repaired
+        raise ValueError(f"expected one of {', '.join(enum)}")
+    return validate
+
+
+VALIDATORS = {name: _compile_validator(name, spec) for name, spec in MEDICAL_SCHEMA.items()}
+
+
+def validate(extracted, fields):
+    # Returns (values, errors). null means "not in the notes" and is valid; a
+    # missing key or a value that cannot be repaired is an error
+    values, errors = {}, {}
+    if extracted is None:
+        return values, {name: 'response was not a JSON object' for name in fields}
+    for name in fields:
+        if name not in extracted:
+            errors[name] = 'missing'
+        elif extracted[name] is None:
+            values[name] = None
+        else:
+            try:
+                values[name] = VALIDATORS[name](extracted[name])
+            except ValueError as e:
+                errors[name] = str(e)
+    return values, errors
+
+
+def retry_instructions(errors):
+    problems = '\n'.join(f'- {name}: {reason}' for name, reason in errors.items())
+    return (
+        f'These fields were missing or invalid:\n{problems}\n'
+        'Reply with only a JSON object containing these fields, using null for '
+        f'values the notes do not state, following this JSON schema:\n{schema_text(tuple(errors))}'
+    )
+
+
+def parse_model_json(text):
+    # Models often wrap the object in prose or ``` fences; take the outermost braces
+    start, end = text.find('{'), text.rfind('}')
+    if start == -1 or end <= start:
+        return None
+    try:
+        value = json.loads(text[start:end + 1])
+    except ValueError:
+        return None
+    return value if isinstance(value, dict) else None
+
+
+@lru_cache(maxsize=None)
+def schema_text(fields):
+    # At most 2**5 field subsets, so the rendered schema is memoized per subset
+    return json.dumps({name: MEDICAL_SCHEMA[name] for name in fields}, indent=2)
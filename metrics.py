@@ -0,0 +1,271 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def header(self):
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        lines = self.header()
+        for key, value in items:
+            lines.append(f'{self.name}{_format_labels(self.labelnames, key)} {_format_number(value)}')
+        return lines
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket (non-cumulative) counts, running sum, total count
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def quantile(self, q, **labels):
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            if state is None:
+                return None
+            return self._estimate(state[0], state[2], q)
+
+    def _estimate(self, counts, total, q):
+        # Linear interpolation inside the bucket holding the q-th observation
+        rank = q * total
+        seen = 0
+        for index, count in enumerate(counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                if index == len(self.buckets):
+                    return lower
+                upper = self.buckets[index]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return 0.0
+
+    def render(self):
+        with self._lock:
+            items = sorted((key, (list(state[0]), state[1], state[2]))
+                           for key, state in self._values.items())
+        lines = self.header()
+        quantile_lines = []
+        for key, (counts, total_sum, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, ('le', _format_number(float(bound))))
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {_format_number(total_sum)}')
+            lines.append(f'{self.name}_count{labels} {total}')
+            for q in QUANTILES:
+                labels = _format_labels(self.labelnames, key, ('quantile', q))
+                value = self._estimate(counts, total, q)
+                quantile_lines.append(f'{self.name}_quantile{labels} {_format_number(value)}')
+        if quantile_lines:
+            # p50/p95/p99 estimated from the buckets, for dashboards without PromQL
+            lines.append(f'# HELP {self.name}_quantile Estimated quantiles of {self.name}')
+            lines.append(f'# TYPE {self.name}_quantile gauge')
+            lines.extend(quantile_lines)
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector):
+        # Collectors refresh gauges from other components right before rendering
+        self._collectors.append(collector)
+
+    def render(self):
+        for collector in self._collectors:
+            collector()
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+
+REGISTRY = Registry()
+
+http_requests = REGISTRY.counter(
+    'http_requests_total', 'HTTP requests by route, method and status', ('route', 'method', 'status'))
+http_errors = REGISTRY.counter(
+    'http_request_errors_total', 'HTTP requests that returned a 5xx status', ('route',))
+http_latency = REGISTRY.histogram(
+    'http_request_duration_seconds', 'Time spent handling HTTP requests', ('route',))
+http_in_flight = REGISTRY.gauge(
+    'http_requests_in_flight', 'HTTP requests currently being handled', ('route',))
+phase_latency = REGISTRY.histogram(
+    'phase_duration_seconds', 'Time spent per request phase', ('endpoint', 'phase'))
+model_requests = REGISTRY.counter(
+    'model_requests_total', 'Upstream model calls by outcome', ('endpoint', 'model', 'outcome'))
+model_tokens = REGISTRY.counter(
+    'model_tokens_total', 'Tokens reported by the model API', ('endpoint', 'model', 'kind'))
+model_latency = REGISTRY.histogram(
+    'model_request_duration_seconds', 'Upstream model call latency', ('endpoint', 'model'))
+model_cost = REGISTRY.counter(
+    'model_cost_total', 'Estimated model spend from Config.MODEL_PRICES', ('endpoint', 'model'))
+model_escalations = REGISTRY.counter(
+    'model_escalations_total', 'Calls sent to a larger model tier', ('endpoint', 'reason'))
+
+
+def observe_phase(name, endpoint, start):
+    elapsed = time.perf_counter() - start
+    phase_latency.observe(elapsed, endpoint=endpoint, phase=name)
+    if has_request_context():
+        g.phase_seconds = g.get('phase_seconds', 0.0) + elapsed
+
+
+@contextmanager
+def phase(name, endpoint):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_phase(name, endpoint, start)
+
+
+def record_usage(endpoint, model, usage, prices=None):
+    if usage is None:
+        return
+    prompt_tokens = usage.prompt_tokens or 0
+    completion_tokens = usage.completion_tokens or 0
+    model_tokens.inc(prompt_tokens, endpoint=endpoint, model=model, kind='prompt')
+    model_tokens.inc(completion_tokens, endpoint=endpoint, model=model, kind='completion')
+    price = (prices or {}).get(model)
+    if price is not None:
+        # Prices are per million tokens
+        model_cost.inc((prompt_tokens * price[0] + completion_tokens * price[1]) / 1e6,
+                       endpoint=endpoint, model=model)
+
+
+def _route():
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+
+def _endpoint():
+    # Same names the views pass to ask_model, e.g. '/extract-medical' -> 'extract-medical'
+    return _route().lstrip('/')
+
+
+def init_app(app):
+    @app.before_request
+    def start_timer():
+        g.request_start = time.perf_counter()
+        g.phase_seconds = 0.0
+        http_in_flight.inc(route=_route())
+        if request.is_json:
+            # Parse eagerly so JSON decoding shows up as its own phase
+            with phase('parse', _endpoint()):
+                request.get_json(silent=True)
+
+    @app.after_request
+    def record_request(response):
+        route = _route()
+        elapsed = time.perf_counter() - g.get('request_start', time.perf_counter())
+        http_latency.observe(elapsed, route=route)
+        http_requests.inc(route=route, method=request.method, status=response.status_code)
+        if response.status_code >= 500:
+            http_errors.inc(route=route)
+        # Whatever no named phase accounted for is routing, views and serialization
+        phase_latency.observe(max(elapsed - g.get('phase_seconds', 0.0), 0.0),
+                              endpoint=_endpoint(), phase='other')
+        return response
+
+    @app.teardown_request
+    def finish_request(exc):
+        if 'request_start' in g:
+            http_in_flight.dec(route=_route())
@@ -0,0 +1,65 @@
+import re
+import zlib
+
+from cache import normalize_text
+
+_PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+_SENTENCE_BREAK = re.compile(r'(?<=[.!?])\s+')
+
+
+def is_heading(paragraph):
+    # Markdown headings, or a short single line without closing punctuation
+    return paragraph.startswith('#') or (
+        '\n' not in paragraph and len(paragraph) <= 80 and paragraph[-1] not in '.!?:;,'
+    )
+
+
+def paragraphs(text, max_chars):
+    for block in _PARAGRAPH_BREAK.split(text or ''):
+        block = block.strip()
+        if not block:
+            continue
+        if len(block) <= max_chars:
+            yield block
+            continue
+        # An oversized paragraph is split between sentences, and hard-split as a last resort
+        piece = ''
+        for sentence in _SENTENCE_BREAK.split(block):
+            while len(sentence) > max_chars:
+                if piece:
+                    yield piece
+                    piece = ''
+                yield sentence[:max_chars]
+                sentence = sentence[max_chars:]
+            if piece and len(piece) + 1 + len(sentence) > max_chars:
+                yield piece
+                piece = ''
+            piece = f'{piece} {sentence}' if piece else sentence
+        if piece:
+            yield piece
+
+
+def split_chunks(text, max_chars=6000, min_chars=1500, boundary_modulus=4):
+    """Split text into chunks of at most max_chars on paragraph and section boundaries.
+
+    Besides size and headings, a chunk also ends after any paragraph whose hash
+    falls on boundary_modulus. Those cut points depend only on the paragraph
+    itself, so editing one part of a newsletter leaves the other chunks (and
+    their cached summaries) unchanged.
+    """
+    chunks = []
+    current = []
+    size = 0
+    for paragraph in paragraphs(text, max_chars):
+        if current and (size + len(paragraph) > max_chars
+                        or (is_heading(paragraph) and size >= min_chars)):
+            chunks.append('\n\n'.join(current))
+            current, size = [], 0
+        current.append(paragraph)
+        size += len(paragraph) + 2
+        if size >= min_chars and zlib.crc32(normalize_text(paragraph).encode('utf-8')) % boundary_modulus == 0:
+            chunks.append('\n\n'.join(current))
+            current, size = [], 0
+    if current:
+        chunks.append('\n\n'.join(current))
+    return chunks
@@ -0,0 +1,74 @@
+import os
+import re
+
+from mistralai.models.chat_completion import ChatMessage
+
+PROMPT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prompts')
+USER_SEPARATOR = '---user---'
+INPUT_PLACEHOLDER = '{input}'
+_FILENAME = re.compile(r'^(?P<name>[\w-]+)\.(?P<version>v\d+)\.txt$')
+
+
+class PromptTemplate:
+    """A static system prefix plus a user message wrapped around the request payload.
+
+    The system ChatMessage is built once, so a request only pays for joining the
+    payload into the user message, and the upstream sees an identical prefix.
+    """
+
+    def __init__(self, name, version, system, user='{input}'):
+        self.name = name
+        self.version = version
+        self.system = system
+        self.user = user
+        self.system_message = ChatMessage(role='system', content=system)
+        self._user_before, _, self._user_after = user.partition(INPUT_PLACEHOLDER)
+
+    def messages(self, payload):
+        return [
+            self.system_message,
+            ChatMessage(role='user', content=self._user_before + payload + self._user_after)
+        ]
+
+    def with_context(self, **context):
+        # Fill load-time placeholders such as {schema} in the system prefix
+        system = self.system
+        for key, value in context.items():
+            system = system.replace('{' + key + '}', value)
+        return PromptTemplate(self.name, self.version, system, self.user)
+
+
+class PromptRegistry:
+    def __init__(self, directory=PROMPT_DIR, versions=None):
+        self._templates = {}
+        self._variants = {}
+        for filename in sorted(os.listdir(directory)):
+            match = _FILENAME.match(filename)
+            if match:
+                with open(os.path.join(directory, filename), encoding='utf-8') as f:
+                    system, _, user = f.read().partition(USER_SEPARATOR)
+                template = PromptTemplate(match['name'], match['version'],
+                                          system.strip(), user.strip() or INPUT_PLACEHOLDER)
+                self._templates[(template.name, template.version)] = template
+
+        # Resolve the active version per prompt once, not on every request
+        self.versions = {name: self.available(name)[-1] for name, _ in self._templates}
+        for name, version in (versions or {}).items():
+            if (name, version) not in self._templates:
+                raise KeyError(f'No prompt template {name!r} version {version!r}')
+            self.versions[name] = version
+
+    def available(self, name):
+        return sorted((version for key, version in self._templates if key == name),
+                      key=lambda version: int(version[1:]))
+
+    def get(self, name, version=None, **context):
+        version = version or self.versions[name]
+        template = self._templates[(name, version)]
+        if not context:
+            return template
+        key = (name, version, tuple(sorted(context.items())))
+        variant = self._variants.get(key)
+        if variant is None:
+            variant = self._variants[key] = template.with_context(**context)
+        return variant
@@ -0,0 +1,146 @@
+import re
+from collections import namedtuple
+
+MortgageRate = namedtuple('MortgageRate', ['product', 'term', 'kind', 'rate', 'apr'])
+
+# The one rate table: the /rates endpoint, the mortgage prompt facts, direct
+# answers and the Streamlit app all read it from here
+RATES = (
+    MortgageRate('30-year fixed-rate', 30, 'fixed', '6.403%', '6.484%'),
+    MortgageRate('20-year fixed-rate', 20, 'fixed', '6.329%', '6.429%'),
+    MortgageRate('15-year fixed-rate', 15, 'fixed', '5.705%', '5.848%'),
+    MortgageRate('10-year fixed-rate', 10, 'fixed', '5.500%', '5.720%'),
+    MortgageRate('7-year ARM', 7, 'arm', '7.011%', '7.660%'),
+    MortgageRate('5-year ARM', 5, 'arm', '6.880%', '7.754%'),
+    MortgageRate('3-year ARM', 3, 'arm', '6.125%', '7.204%'),
+    MortgageRate('30-year fixed-rate FHA', 30, 'fha', '5.527%', '6.316%'),
+    MortgageRate('30-year fixed-rate VA', 30, 'va', '5.684%', '6.062%'),
+)
+
+_TERM = re.compile(r'\b(\d{1,2})(?:/\d)?(?:[\s-]*(?:years?|yrs?)\b|[\s-]*(?=arm\b))', re.I)
+_KINDS = {
+    'fha': re.compile(r'\bFHA\b', re.I),
+    'va': re.compile(r'\bVA\b'),
+    'arm': re.compile(r'\b(?:ARMs?|adjustable[- ]rate)\b', re.I),
+    'fixed': re.compile(r'\bfixed\b', re.I),
+}
+_RATE_WORDS = re.compile(r'\b(?:rates?|APRs?|interest)\b', re.I)
+# Anything beyond "what is the rate" needs the model
+_NEEDS_MODEL = re.compile(
+    r'\b(?:explain|difference|differ|compare|comparison|versus|vs|which|should|better|best for|'
+    r'recommend|advice|advise|require|requirements?|qualif\w*|eligib\w*|why|how|refinanc\w*|'
+    r'closing|fees?|points|pre-?approv\w*|documents?|apply|application|payment|afford\w*|'
+    r'lock|decide|options)\b', re.I)
+# Loan products we publish no rate for; a question about one needs the model
+_UNKNOWN_PRODUCTS = re.compile(
+    r'\b(?:jumbo|heloc|home[- ]equity|lines? of credit|reverse mortgage|usda|construction|'
+    r'interest[- ]only|balloon|bridge loan|commercial|investment propert\w*|second home|'
+    r'second mortgage|cash[- ]out)\b', re.I)
+_SENTENCE = re.compile(r'[^.?!\n]+[.?!]*')
+# Requests phrased without a question mark: "Please send me the FHA rate."
+_REQUEST = re.compile(
+    r"^\s*(?:please|kindly|tell me|let me know|send|give me|share|provide|quote|"
+    r"i(?:'d| would) like|i want to know|i(?:'m| am) (?:interested|looking|wondering))\b", re.I)
+_CLOSING = re.compile(r'^(?:best|kind|warm)?\s*(?:regards|thanks|thank you|sincerely|cheers|best),?$', re.I)
+_NAME = re.compile(r"^[A-Z][a-zA-Z'-]+(?: [A-Z][a-zA-Z'-]+)?$")
+
+_BY_TERM = {}
+for _rate in RATES:
+    _BY_TERM.setdefault(_rate.term, []).append(_rate)
+
+
+def as_dicts(rates=RATES):
+    return [{'product': r.product, 'interest_rate': r.rate, 'apr': r.apr} for r in rates]
+
+
+def as_table(rates=RATES):
+    return {
+        'Product': [r.product for r in rates],
+        'Interest Rate': [r.rate for r in rates],
+        'APR': [r.apr for r in rates],
+    }
+
+
+def facts_text(rates=RATES):
+    return '\n'.join(f'{r.product}: interest rate {r.rate}, APR {r.apr}' for r in rates)
+
+
+def find_products(text, strict=False):
+    """Rate rows an email asks about, in table order; empty when it names none.
+
+    Terms pick the product (3/5/7-year are ARMs, 10-30 year are fixed); FHA,
+    VA, ARM and fixed narrow 30-year mentions or stand for the whole family.
+    With strict, a term (or term and kind) the table has no row for returns
+    None instead of falling back to the nearest rows.
+    """
+    kinds = {kind for kind, pattern in _KINDS.items() if pattern.search(text)}
+    terms = {int(match.group(1)) for match in _TERM.finditer(text)}
+    wanted = set()
+    for term in terms:
+        candidates = _BY_TERM.get(term, [])
+        narrowed = [r for r in candidates if r.kind in kinds]
+        if strict and not (narrowed or candidates and not kinds):
+            # "25-year fixed" or "15-year VA": we publish no such rate
+            return None
+        if not narrowed:
+            # "30-year" alone means the conventional loan
+            narrowed = [r for r in candidates if r.kind in ('fixed', 'arm')]
+        wanted.update(narrowed)
+    for kind in kinds & {'fha', 'va'}:
+        wanted.update(r for r in RATES if r.kind == kind)
+    for kind in kinds & {'arm', 'fixed'}:
+        if not any(r.kind == kind for r in wanted):
+            wanted.update(r for r in RATES if r.kind == kind)
+    return [r for r in RATES if r in wanted]
+
+
+def customer_name(email):
+    # The line after a closing such as "Best regards," when it looks like a name
+    lines = [line.strip() for line in email.strip().splitlines() if line.strip()]
+    if len(lines) >= 2 and _CLOSING.match(lines[-2]) and _NAME.match(lines[-1]):
+        return lines[-1]
+    return None
+
+
+def questions(email):
+    # Sentences that ask for something: ending in "?" or phrased as a request
+    sentences = (sentence.strip() for sentence in _SENTENCE.findall(email))
+    return [sentence for sentence in sentences
+            if sentence and (sentence.endswith('?') or _REQUEST.match(sentence))]
+
+
+def direct_answer(email):
+    """A templated reply for emails that only ask for specific rates, else None.
+
+    Every question must name a rate and a product from the table; anything
+    else (another question, an unlisted product, advice) goes to the model.
+    """
+    if _NEEDS_MODEL.search(email) or _UNKNOWN_PRODUCTS.search(email):
+        return None
+    asked = questions(email)
+    wanted = set()
+    for question in asked:
+        found = find_products(question, strict=True) if _RATE_WORDS.search(question) else None
+        if not found:
+            return None
+        wanted.update(found)
+    if not wanted:
+        return None
+    products = [r for r in RATES if r in wanted]
+    name = customer_name(email)
+    rows = '\n'.join(f'- {r.product}: interest rate {r.rate}, APR {r.apr}' for r in products)
+    return (
+        f"Dear {name or 'Customer'},\n\n"
+        'Thank you for reaching out. Here are our current rates:\n\n'
+        f'{rows}\n\n'
+        'Rates are subject to change and depend on your credit profile. '
+        'Please let us know if you have any other questions.\n\n'
+        'Best regards,\n'
+        'Lender Customer Support'
+    )
+
+
+def prompt_input(email):
+    # Only the rows the email mentions go to the model; all of them if it names none
+    products = find_products(email) or RATES
+    return f'# Facts\n{facts_text(products)}\n\n# Email\n{email}'
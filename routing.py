@@ -0,0 +1,33 @@
+class ModelRouter:
+    """Picks the model per endpoint from an ordered list of tiers, smallest first.
+
+    Each endpoint starts on its configured tier. Inputs longer than
+    escalate_chars start one tier up, and callers can ask for the next tier
+    when an answer fails validation.
+    """
+
+    def __init__(self, tiers, routes=None, default_model=None, escalate_chars=8000):
+        self.tiers = list(tiers)
+        self.routes = routes or {}
+        self.default_model = default_model or self.tiers[0]
+        self.escalate_chars = escalate_chars
+
+    def base_model(self, endpoint):
+        return self.routes.get(endpoint) or self.default_model
+
+    def select(self, endpoint, messages):
+        # Returns (model, escalation reason or None)
+        model = self.base_model(endpoint)
+        size = sum(len(m.content) for m in messages if m.role != 'system')
+        if self.escalate_chars and size > self.escalate_chars:
+            larger = self.escalate(model)
+            if larger is not None:
+                return larger, 'input_size'
+        return model, None
+
+    def escalate(self, model):
+        # Next larger tier, or None when already at the top (or not a known tier)
+        if model not in self.tiers:
+            return None
+        index = self.tiers.index(model)
+        return self.tiers[index + 1] if index + 1 < len(self.tiers) else None
@@ -0,0 +1,146 @@
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+
+
+class SchedulerTimeout(Exception):
+    pass
+
+
+class TokenBucket:
+    """Upstream request quota: `rate` tokens per second, bursting up to `burst`."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+
+    def take(self):
+        # Returns 0 when a token was taken, otherwise seconds until one is available.
+        # Callers hold the scheduler lock, so no locking here.
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+
+class ModelScheduler:
+    """Priority queue with an AIMD concurrency limit in front of the model client.
+
+    Lower priority numbers are served first. The limit grows by about one slot
+    per window of successful calls and is cut multiplicatively on 429s or when
+    a call takes much longer than that endpoint's recent average.
+    """
+
+    def __init__(self, priorities=None, default_priority=1, class_shares=None,
+                 initial_limit=8, min_limit=1, max_limit=64, rate=0.0, burst=1,
+                 latency_tolerance=2.0, backoff=0.7, queue_timeout=30.0):
+        self.priorities = priorities or {}
+        self.default_priority = default_priority
+        self.class_shares = class_shares or {}
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_tolerance = latency_tolerance
+        self.backoff = backoff
+        self.queue_timeout = queue_timeout
+        self.bucket = TokenBucket(rate, burst)
+        self.throttled = 0
+        self.rejected = 0
+        self._cond = threading.Condition()
+        self._heap = []
+        self._sequence = itertools.count()
+        self._in_flight = 0
+        self._class_in_flight = {}
+        self._latency = {}
+        self._last_decrease = 0.0
+
+    @contextmanager
+    def slot(self, endpoint):
+        priority = self.priorities.get(endpoint, self.default_priority)
+        self._acquire(priority)
+        start = time.monotonic()
+        failed = throttled = False
+        try:
+            yield
+        except BaseException as e:
+            failed = True
+            throttled = getattr(e, 'http_status', None) == 429
+            raise
+        finally:
+            self._release(endpoint, priority, time.monotonic() - start, failed, throttled)
+
+    def _class_limit(self, priority):
+        share = self.class_shares.get(priority)
+        return self.limit if share is None else max(1.0, self.limit * share)
+
+    def _acquire(self, priority):
+        entry = (priority, next(self._sequence))
+        deadline = time.monotonic() + self.queue_timeout
+        with self._cond:
+            heapq.heappush(self._heap, entry)
+            while True:
+                wait = None
+                if (self._heap[0] == entry
+                        and self._in_flight < int(self.limit)
+                        and self._class_in_flight.get(priority, 0) < int(self._class_limit(priority))):
+                    wait = self.bucket.take()
+                    if wait == 0:
+                        heapq.heappop(self._heap)
+                        self._in_flight += 1
+                        self._class_in_flight[priority] = self._class_in_flight.get(priority, 0) + 1
+                        # The next waiter may be able to go as well
+                        self._cond.notify_all()
+                        return
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._heap.remove(entry)
+                    heapq.heapify(self._heap)
+                    self.rejected += 1
+                    self._cond.notify_all()
+                    raise SchedulerTimeout('Model request queue is full, try again shortly')
+                self._cond.wait(min(wait, remaining) if wait else remaining)
+
+    def _release(self, endpoint, priority, latency, failed, throttled):
+        with self._cond:
+            self._in_flight -= 1
+            self._class_in_flight[priority] -= 1
+
+            average = self._latency.get(endpoint)
+            slow = average is not None and latency > self.latency_tolerance * average
+            if not failed:
+                self._latency[endpoint] = latency if average is None else 0.9 * average + 0.1 * latency
+
+            now = time.monotonic()
+            if throttled or slow:
+                if throttled:
+                    self.throttled += 1
+                # Cut at most once per average call duration so one burst isn't counted many times
+                if throttled or now - self._last_decrease > (average or 0.0):
+                    self.limit = max(self.min_limit, self.limit * self.backoff)
+                    self._last_decrease = now
+            elif not failed:
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            queued = {}
+            for priority, _ in self._heap:
+                queued[priority] = queued.get(priority, 0) + 1
+            return {
+                'limit': round(self.limit, 2),
+                'in_flight': self._in_flight,
+                'queued': queued,
+                'throttled': self.throttled,
+                'rejected': self.rejected,
+            }
@@ -0,0 +1,172 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+def estimate_tokens(text):
+    # Rough count (about four characters per token), enough for budgeting
+    return len(text) // 4 + 1
+
+
+class MemorySessionStore:
+    """In-process LRU over sessions, bounded by session count and total serialized size."""
+
+    def __init__(self, max_sessions=10000, max_bytes=32 * 1024 * 1024):
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self._sessions = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, session_id):
+        with self._lock:
+            data = self._sessions.get(session_id)
+            if data is None:
+                return None
+            self._sessions.move_to_end(session_id)
+        return json.loads(data)
+
+    def set(self, session_id, session):
+        data = json.dumps(session)
+        with self._lock:
+            old = self._sessions.pop(session_id, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._sessions[session_id] = data
+            self._bytes += len(data)
+            while self._sessions and (len(self._sessions) > self.max_sessions
+                                      or self._bytes > self.max_bytes):
+                _, evicted = self._sessions.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+class SQLiteSessionStore:
+    """Sessions on local disk so conversations survive restarts, oldest-updated evicted first."""
+
+    def __init__(self, path, max_sessions=10000):
+        self.path = path
+        self.max_sessions = max_sessions
+        self._connect()
+        # Connections must not cross a fork (gunicorn preload_app); children reopen
+        os.register_at_fork(after_in_child=self._connect)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS chat_sessions ('
+            'session_id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)'
+        )
+        self._conn.execute(
+            'CREATE INDEX IF NOT EXISTS chat_sessions_lru ON chat_sessions (updated_at)'
+        )
+        self._conn.commit()
+
+    def _connect(self):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+
+    def get(self, session_id):
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT data FROM chat_sessions WHERE session_id = ?', (session_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, session_id, session):
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO chat_sessions VALUES (?, ?, ?)',
+                (session_id, json.dumps(session), time.time())
+            )
+            self._conn.execute(
+                'DELETE FROM chat_sessions WHERE session_id IN ('
+                'SELECT session_id FROM chat_sessions ORDER BY updated_at DESC '
+                'LIMIT -1 OFFSET ?)',
+                (self.max_sessions,)
+            )
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM chat_sessions').fetchone()[0]
+
+
+class SessionManager:
+    """Chat history per session with background compaction of old turns.
+
+    A session is {'summary': str or None, 'turns': [[role, content], ...]}.
+    Once the history passes token_budget, everything but the last keep_recent
+    messages is folded into the summary by `summarize(summary, turns)`, so the
+    prompt stays roughly the same size however long the conversation runs.
+    """
+
+    def __init__(self, store, summarize, token_budget=1500, keep_recent=6):
+        self.store = store
+        self.summarize = summarize
+        self.token_budget = token_budget
+        self.keep_recent = keep_recent
+        self.compactions = 0
+        self._lock = threading.Lock()
+        self._compacting = set()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='session')
+
+    @staticmethod
+    def new_id():
+        return uuid.uuid4().hex
+
+    def load(self, session_id):
+        return self.store.get(session_id) or {'summary': None, 'turns': []}
+
+    def append(self, session_id, user_message, response):
+        with self._lock:
+            session = self.load(session_id)
+            session['turns'].extend([['user', user_message], ['assistant', response]])
+            self.store.set(session_id, session)
+            if self.history_tokens(session) <= self.token_budget or session_id in self._compacting:
+                return
+            self._compacting.add(session_id)
+        self._executor.submit(self._compact, session_id)
+
+    def history_tokens(self, session):
+        return estimate_tokens(session['summary'] or '') + sum(
+            estimate_tokens(content) for _, content in session['turns'])
+
+    def _compact(self, session_id):
+        try:
+            session = self.load(session_id)
+            old_turns = session['turns'][:-self.keep_recent]
+            if not old_turns:
+                return
+            summary = self.summarize(session['summary'], old_turns)
+            with self._lock:
+                # Turns are only ever appended, so the compacted prefix is still in place
+                # unless another writer replaced the session meanwhile
+                current = self.load(session_id)
+                if current['summary'] != session['summary'] or current['turns'][:len(old_turns)] != old_turns:
+                    return
+                current['summary'] = summary
+                current['turns'] = current['turns'][len(old_turns):]
+                self.store.set(session_id, current)
+                self.compactions += 1
+        finally:
+            with self._lock:
+                self._compacting.discard(session_id)
+
+    def stats(self):
+        return {'sessions': len(self.store), 'compactions': self.compactions}
+
+
+def create_session_manager(config, summarize):
+    if config.CHAT_SESSION_STORE == 'sqlite':
+        store = SQLiteSessionStore(config.CHAT_SESSION_PATH, max_sessions=config.CHAT_SESSION_MAX_SESSIONS)
+    else:
+        store = MemorySessionStore(max_sessions=config.CHAT_SESSION_MAX_SESSIONS,
+                                   max_bytes=config.CHAT_SESSION_MAX_BYTES)
+    return SessionManager(store, summarize, token_budget=config.CHAT_HISTORY_TOKEN_BUDGET,
+                          keep_recent=config.CHAT_KEEP_RECENT)
@@ -0,0 +1,123 @@
+import re
+import threading
+import zlib
+from collections import namedtuple
+
+import numpy as np
+
+_TOKEN = re.compile(r'[a-z0-9]+')
+
+Match = namedtuple('Match', ['category', 'score', 'query'])
+
+
+def normalize_query(text):
+    return ' '.join(_TOKEN.findall(text.lower()))
+
+
+def text_features(text, ngram_range=(3, 5)):
+    # Word unigrams plus character n-grams taken inside word boundaries
+    words = _TOKEN.findall(text.lower())
+    features = list(words)
+    low, high = ngram_range
+    for word in words:
+        padded = f' {word} '
+        for n in range(low, high + 1):
+            features.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+    return features
+
+
+class CategoryIndex:
+    """Near-duplicate lookup over past (query, category) pairs using hashed TF-IDF vectors."""
+
+    def __init__(self, threshold=0.75, max_entries=2000, dim=4096, refresh_every=64):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.dim = dim
+        self.refresh_every = refresh_every
+        self._tf = np.zeros((max_entries, dim), dtype=np.float32)
+        self._norms = np.ones(max_entries, dtype=np.float32)
+        self._df = np.zeros(dim, dtype=np.float32)
+        self._idf = np.ones(dim, dtype=np.float32)
+        self._queries = [None] * max_entries
+        self._categories = [None] * max_entries
+        self._rows = {}
+        self._size = 0
+        self._next = 0
+        self._since_refresh = 0
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.bypasses = 0
+
+    def _vectorize(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature in text_features(text):
+            vector[zlib.crc32(feature.encode('utf-8')) % self.dim] += 1.0
+        nonzero = np.flatnonzero(vector)
+        # Sublinear term frequency keeps long queries from dominating
+        vector[nonzero] = 1.0 + np.log(vector[nonzero])
+        return vector, nonzero
+
+    def _refresh_idf(self):
+        size = max(self._size, 1)
+        self._idf = np.log((1.0 + size) / (1.0 + self._df)).astype(np.float32) + 1.0
+        weighted = self._tf[:self._size] * self._idf
+        norms = np.sqrt(np.einsum('ij,ij->i', weighted, weighted))
+        self._norms[:self._size] = np.maximum(norms, 1e-12)
+        self._since_refresh = 0
+
+    def lookup(self, query, threshold=None):
+        threshold = self.threshold if threshold is None else threshold
+        vector, nonzero = self._vectorize(query)
+        with self._lock:
+            self.lookups += 1
+            if self._size == 0 or nonzero.size == 0:
+                return None
+            weighted = vector[nonzero] * self._idf[nonzero]
+            query_norm = float(np.linalg.norm(weighted))
+            # Only the query's non-zero columns contribute to the dot products
+            scores = self._tf[:self._size, nonzero] @ (weighted * self._idf[nonzero])
+            scores /= self._norms[:self._size] * max(query_norm, 1e-12)
+            best = int(np.argmax(scores))
+            score = float(scores[best])
+            if score < threshold:
+                return None
+            self.bypasses += 1
+            return Match(self._categories[best], score, self._queries[best])
+
+    def add(self, query, category):
+        key = normalize_query(query)
+        vector, nonzero = self._vectorize(query)
+        if nonzero.size == 0:
+            return
+        with self._lock:
+            row = self._rows.get(key)
+            if row is None:
+                row = self._next
+                if self._queries[row] is not None:
+                    # Ring buffer is full: forget the oldest pair
+                    self._df -= self._tf[row] > 0
+                    del self._rows[normalize_query(self._queries[row])]
+                else:
+                    self._size += 1
+                self._next = (self._next + 1) % self.max_entries
+                self._rows[key] = row
+                self._tf[row] = vector
+                self._df[nonzero] += 1
+                self._since_refresh += 1
+            self._queries[row] = query
+            self._categories[row] = category
+            if self._since_refresh >= self.refresh_every or self._size <= self.refresh_every:
+                self._refresh_idf()
+            else:
+                weighted = vector[nonzero] * self._idf[nonzero]
+                self._norms[row] = max(float(np.linalg.norm(weighted)), 1e-12)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': self._size,
+                'threshold': self.threshold,
+                'lookups': self.lookups,
+                'bypasses': self.bypasses,
+                'bypass_rate': self.bypasses / self.lookups if self.lookups else 0.0,
+            }
@@ -1,11 +1,17 @@
 import requests
 import json
+import time
+
+from api_client import get_client
 
 BASE_URL = "https://lab7-97641147142.me-central1.run.app"
+client = get_client(BASE_URL)
+# Give up on a background job after this many seconds
+JOB_TIMEOUT = 900
 
 def try_endpoint(url, payload, endpoint_name=""):
     try:
-        response = requests.post(url, json=payload)
+        response = client.session.post(url, json=payload, timeout=client.timeout)
         print(f"\nRequest to {endpoint_name}:")
         print(f"Payload: {json.dumps(payload, indent=2)}")
         print(f"Status Code: {response.status_code}")
@@ -47,6 +53,18 @@ def test_categorize_endpoint():
     for query in test_queries:
         try_endpoint(url, {"query": query}, "Categorize API")
 
+def test_categorize_batch_endpoint():
+    url = f"{BASE_URL}/categorize/batch"
+    test_queries = [
+        "How can I get a credit card?",
+        "I want to open a new account",
+        "My card was stolen",
+        "My card was stolen"
+    ]
+    
+    print("\nTesting Categorize Batch API Endpoint...")
+    try_endpoint(url, {"queries": test_queries}, "Categorize Batch API")
+
 def test_medical_endpoint():
     url = f"{BASE_URL}/extract-medical"
     medical_notes = """
@@ -62,6 +80,16 @@ def test_medical_endpoint():
     print("\nTesting Medical Extraction API Endpoint...")
     try_endpoint(url, {"medical_notes": medical_notes}, "Medical API")
 
+def test_medical_batch_endpoint():
+    url = f"{BASE_URL}/extract-medical/batch"
+    medical_notes = [
+        "A 45-year-old female patient presented with recurring migraine. She does not smoke and weighs 140 lbs.",
+        "A 32-year-old male patient was diagnosed with acne. He is a smoker and weighs 180 lbs."
+    ]
+    
+    print("\nTesting Medical Extraction Batch API Endpoint...")
+    try_endpoint(url, {"medical_notes": medical_notes}, "Medical Batch API")
+
 def test_mortgage_endpoint():
     url = f"{BASE_URL}/mortgage-response"
     email = """
@@ -98,12 +126,44 @@ def test_newsletter_endpoint():
     print("\nTesting Newsletter Analysis API Endpoint...")
     try_endpoint(url, {"newsletter": newsletter}, "Newsletter API")
 
+def test_newsletter_job():
+    url = f"{BASE_URL}/analyze-newsletter"
+    newsletter = """
+    Q3 2023 Market Update
+
+    Inflation showed signs of cooling, and the real estate market remained
+    challenging due to high interest rates.
+    """
+
+    print("\nTesting Newsletter Analysis Job Mode...")
+    try:
+        response = client.session.post(url, json={"newsletter": newsletter, "job": True},
+                                       timeout=client.timeout)
+        print(f"Status Code: {response.status_code}")
+        if response.status_code == 202:
+            job = response.json()
+            # Long-poll until the report is ready
+            deadline = time.monotonic() + JOB_TIMEOUT
+            while job.get("state") not in ("done", "failed") and time.monotonic() < deadline:
+                job = client.session.get(f"{BASE_URL}/jobs/{job['job_id']}",
+                                         params={"wait": 20}, timeout=client.timeout).json()
+            print(f"Response: {json.dumps(job, indent=2)}")
+        else:
+            print(f"Error: {response.text}")
+
+    except requests.exceptions.ConnectionError:
+        print(f"Error: Could not connect to {url}. Make sure the service is running.")
+    except Exception as e:
+        print(f"Error: {str(e)}")
+
+    print("-" * 50)
+
 def test_health_endpoint():
     url = f"{BASE_URL}/health"
     
     print("\nTesting Health Check Endpoint...")
     try:
-        response = requests.get(url)
+        response = client.session.get(url, timeout=client.timeout)
         print(f"Status Code: {response.status_code}")
         print(f"Response: {json.dumps(response.json(), indent=2)}")
         
@@ -114,11 +174,31 @@ def test_health_endpoint():
     
     print("-" * 50)
 
+def test_rates_endpoint():
+    url = f"{BASE_URL}/rates"
+
+    print("\nTesting Mortgage Rates Endpoint...")
+    try:
+        response = client.session.get(url, timeout=client.timeout)
+        print(f"Status Code: {response.status_code}")
+        print(f"Response: {json.dumps(response.json(), indent=2)}")
+
+    except requests.exceptions.ConnectionError:
+        print(f"Error: Could not connect to {url}. Make sure the service is running.")
+    except Exception as e:
+        print(f"Error: {str(e)}")
+
+    print("-" * 50)
+
 if __name__ == "__main__":
     # Test all endpoints
     test_health_endpoint()
     test_chat_endpoint()
     test_categorize_endpoint()
+    test_categorize_batch_endpoint()
     test_medical_endpoint()
+    test_medical_batch_endpoint()
+    test_rates_endpoint()
     test_mortgage_endpoint()
-    test_newsletter_endpoint() 
\ No newline at end of file
+    test_newsletter_endpoint()
+    test_newsletter_job()
@@ -0,0 +1,45 @@
+import medical_rules
+
+EXAMPLE_NOTES = """
+A 60-year-old male patient, Mr. Johnson, presented with symptoms
+of increased thirst, frequent urination, fatigue, and unexplained
+weight loss. Upon evaluation, he was diagnosed with diabetes,
+confirmed by elevated blood sugar levels. Mr. Johnson's weight
+is 210 lbs. He has been prescribed Metformin to be taken twice daily
+with meals. It was noted during the consultation that the patient is
+a current smoker.
+"""
+
+
+def test_example_notes_resolve_every_field():
+    assert medical_rules.extract(EXAMPLE_NOTES) == {
+        "age": 60, "gender": "male", "diagnosis": "diabetes", "weight": 210, "smoking": "yes"
+    }
+
+
+def test_denied_smoking_in_a_list_is_no():
+    assert medical_rules.extract("Patient denies alcohol, drug use, or smoking.")["smoking"] == "no"
+    assert medical_rules.extract("No alcohol or smoking.")["smoking"] == "no"
+
+
+def test_weight_change_is_not_a_weight():
+    assert "weight" not in medical_rules.extract("Reports weight loss of 15 lbs over two months.")
+    assert "weight" not in medical_rules.extract("Weight gain of 12 lbs since spring.")
+    assert medical_rules.extract("Weight loss of 15 lbs; weighs 180 lbs today.")["weight"] == 180
+
+
+def test_family_history_is_not_a_diagnosis():
+    assert "diagnosis" not in medical_rules.extract("Mother has diabetes.")
+    assert "diagnosis" not in medical_rules.extract("Family history of arthritis.")
+    assert medical_rules.extract("Father has diabetes. Diagnosed with migraine.")["diagnosis"] == "migraine"
+
+
+def test_another_persons_age_and_pronouns_are_ignored():
+    fields = medical_rules.extract("Her 5-year-old son came along; the patient, 38, reports headaches.")
+    assert "age" not in fields
+    assert "gender" not in fields
+
+
+def test_validator_still_repairs_weight_strings():
+    values, errors = medical_rules.validate({"weight": "210 lbs"}, ["weight"])
+    assert values == {"weight": 210} and errors == {}
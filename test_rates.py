@@ -0,0 +1,27 @@
+import rates
+
+
+def test_rate_only_questions_are_answered_directly():
+    answer = rates.direct_answer("Hi,\n\nWhat are your current 5-year ARM and 7-year ARM rates?\n\nThanks,\nJane Doe")
+    assert answer is not None
+    assert "5-year ARM" in answer and "7-year ARM" in answer and "Dear Jane Doe" in answer
+    assert rates.direct_answer("Please send me the FHA rate.\n\nBest regards,\nTom") is not None
+
+
+def test_extra_questions_go_to_the_model():
+    assert rates.direct_answer(
+        "What is your 30-year fixed rate? Also, do you offer home equity lines of credit?") is None
+    assert rates.direct_answer(
+        "What is your 15-year fixed rate? If I take it, can I pay it off early without penalty?") is None
+    assert rates.direct_answer(
+        "What's the VA rate? I left the service last year, am I still covered?") is None
+
+
+def test_unlisted_products_go_to_the_model():
+    assert rates.direct_answer("What is the rate on a 30 year jumbo loan?") is None
+
+
+def test_terms_without_a_listed_rate_go_to_the_model():
+    assert rates.direct_answer("What is your 25-year fixed rate?") is None
+    assert rates.direct_answer("What's the rate on a 40-year fixed mortgage?") is None
+    assert rates.direct_answer("What is your VA rate and is there a 15-year VA option?") is None
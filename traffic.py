@@ -0,0 +1,255 @@
+import atexit
+import glob
+import gzip
+import json
+import os
+import threading
+import time
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+from flask import g, request
+
+# One row per logged HTTP request; segments store these as parallel columns
+COLUMNS = (
+    'ts', 'endpoint', 'status', 'latency_ms', 'stream', 'request', 'response',
+    'models', 'model_calls', 'prompt_tokens', 'completion_tokens',
+)
+SEGMENT_GLOB = 'traffic-*.json.gz'
+
+# Model calls made for the request being logged: (model, prompt_tokens, completion_tokens)
+_calls = ContextVar('traffic_calls', default=None)
+
+
+class TrafficLog:
+    """Append-only request/response log written as gzipped, columnar JSON segments.
+
+    record() only appends to an in-memory buffer (dropping rows once
+    `max_pending` are waiting) so the request path never touches the disk. A
+    background thread writes the buffer out as a new segment every
+    `flush_interval` seconds or once `segment_rows` rows are waiting, then
+    deletes the oldest segments past `max_bytes` or `max_age` seconds.
+    Segments are never rewritten, and file names carry the pid, so several
+    worker processes can share one directory.
+    """
+
+    def __init__(self, directory, flush_interval=30.0, segment_rows=1000, max_pending=10000,
+                 max_bytes=256 * 1024 * 1024, max_age=7 * 86400):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.segment_rows = segment_rows
+        self.max_pending = max_pending
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.written = 0
+        self.dropped = 0
+        self.segments = 0
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._rows = []
+        self._wake = threading.Event()
+        self._pid = None
+        self._sequence = 0
+        os.makedirs(directory, exist_ok=True)
+        atexit.register(self.flush)
+
+    def record(self, row):
+        with self._lock:
+            if self._pid != os.getpid():
+                # First row in this process (gunicorn forks after import): start the flusher here
+                self._start()
+            if len(self._rows) >= self.max_pending:
+                self.dropped += 1
+                return
+            self._rows.append(row)
+            if len(self._rows) >= self.segment_rows:
+                self._wake.set()
+
+    def flush(self):
+        with self._lock:
+            rows, self._rows = self._rows, []
+        if rows:
+            # The flusher and the exit hook can both get here
+            with self._write_lock:
+                self._write_segment(rows)
+                self._rotate()
+
+    def stats(self):
+        with self._lock:
+            return {'pending': len(self._rows), 'written': self.written,
+                    'dropped': self.dropped, 'segments': self.segments}
+
+    def _start(self):
+        self._pid = os.getpid()
+        self._rows = []
+        self._wake = threading.Event()
+        threading.Thread(target=self._run, name='traffic-log', daemon=True).start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except OSError:
+                # A full or unwritable disk must not kill the flusher; those rows are lost
+                pass
+
+    def _write_segment(self, rows):
+        self._sequence += 1
+        stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')
+        name = f'traffic-{stamp}-{os.getpid()}-{self._sequence:06d}.json.gz'
+        segment = {
+            'columns': list(COLUMNS),
+            'rows': len(rows),
+            'data': {column: [row.get(column) for row in rows] for column in COLUMNS},
+        }
+        # Written under a temporary name so readers never see a partial segment
+        path = os.path.join(self.directory, name)
+        with gzip.open(path + '.tmp', 'wt', encoding='utf-8') as output:
+            json.dump(segment, output, separators=(',', ':'))
+        os.replace(path + '.tmp', path)
+        with self._lock:
+            self.written += len(rows)
+            self.segments += 1
+
+    def _rotate(self):
+        now = time.time()
+        entries = []
+        for path in glob.glob(os.path.join(self.directory, SEGMENT_GLOB)):
+            try:
+                status = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((status.st_mtime, status.st_size, path))
+        entries.sort(reverse=True)
+        total = 0
+        for mtime, size, path in entries:
+            total += size
+            if total > self.max_bytes or now - mtime > self.max_age:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    # Another worker rotated it first
+                    pass
+
+
+def read_segments(directory, endpoints=None, since=None):
+    """Logged rows as dicts, oldest segment first, optionally filtered."""
+    for path in sorted(glob.glob(os.path.join(directory, SEGMENT_GLOB))):
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as segment_file:
+                segment = json.load(segment_file)
+        except (OSError, ValueError):
+            continue
+        data = segment['data']
+        for index in range(segment['rows']):
+            row = {column: values[index] for column, values in data.items()}
+            if endpoints and row['endpoint'] not in endpoints:
+                continue
+            if since is not None and row['ts'] < since:
+                continue
+            yield row
+
+
+def note_usage(model, usage):
+    # Attributes a model call to the HTTP request being logged, when there is one
+    calls = _calls.get()
+    if calls is not None:
+        calls.append((model, getattr(usage, 'prompt_tokens', None) or 0,
+                      getattr(usage, 'completion_tokens', None) or 0))
+
+
+def bind(fn):
+    """Wraps fn so model calls it makes on a pool thread count toward the current request."""
+    calls = _calls.get()
+    if calls is None:
+        return fn
+
+    def bound(*args, **kwargs):
+        token = _calls.set(calls)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _calls.reset(token)
+    return bound
+
+
+def init_app(app, log):
+    """Logs every POST request with its JSON body, response, latency and model usage."""
+
+    @app.before_request
+    def start_row():
+        _calls.set([] if request.method == 'POST' else None)
+        if request.method == 'POST':
+            g.traffic_start = time.perf_counter()
+
+    @app.after_request
+    def log_row(response):
+        if 'traffic_start' not in g:
+            return response
+        payload = request.get_json(silent=True)
+        row = {
+            'ts': time.time(),
+            'endpoint': request.path.lstrip('/'),
+            'status': response.status_code,
+            'request': json.dumps(payload) if payload is not None else None,
+        }
+        calls = _calls.get() or []
+        start = g.traffic_start
+        if response.is_streamed:
+            # The body is produced after this hook returns; log the final event once it is sent
+            response.response = _logged_stream(response.response, log, row, start, calls)
+            return response
+        row.update(_usage_columns(calls), stream=False, response=response.get_data(as_text=True),
+                   latency_ms=round(1000 * (time.perf_counter() - start), 3))
+        log.record(row)
+        return response
+
+
+def _usage_columns(calls):
+    return {
+        'models': ','.join(sorted({model for model, _, _ in calls})) or None,
+        'model_calls': len(calls),
+        'prompt_tokens': sum(tokens for _, tokens, _ in calls),
+        'completion_tokens': sum(tokens for _, _, tokens in calls),
+    }
+
+
+def _logged_stream(chunks, log, row, start, calls):
+    last = None
+    iterator = iter(chunks)
+    try:
+        while True:
+            # The body runs after the request is over; keep its model calls on this row
+            token = _calls.set(calls)
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                break
+            finally:
+                _calls.reset(token)
+            text = chunk.decode('utf-8') if isinstance(chunk, bytes) else chunk
+            # The closing event carries the whole response (or the error)
+            if text.startswith(('data: {"response"', 'data: {"error"')):
+                last = text[len('data: '):].strip()
+            yield chunk
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+        row.update(_usage_columns(calls), stream=True, response=last,
+                   latency_ms=round(1000 * (time.perf_counter() - start), 3))
+        log.record(row)
+
+
+def create_traffic_log(config):
+    if not config.TRAFFIC_LOG_ENABLED:
+        return None
+    return TrafficLog(
+        config.TRAFFIC_LOG_DIR,
+        flush_interval=config.TRAFFIC_LOG_FLUSH_INTERVAL,
+        segment_rows=config.TRAFFIC_LOG_SEGMENT_ROWS,
+        max_pending=config.TRAFFIC_LOG_MAX_PENDING,
+        max_bytes=config.TRAFFIC_LOG_MAX_BYTES,
+        max_age=config.TRAFFIC_LOG_MAX_AGE
+    )